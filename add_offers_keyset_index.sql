@@ -0,0 +1,20 @@
+-- Keyset pagination of GET /api/offers (newest first within a shop)
+
+-- Every offer needs a created_at to anchor a cursor; a NULL one would end
+-- pagination early. Fill gaps from updated_at, then forbid NULLs
+UPDATE offers
+SET created_at = COALESCE(updated_at, now())
+WHERE created_at IS NULL;
+
+ALTER TABLE offers
+ALTER COLUMN created_at SET NOT NULL;
+
+-- CONCURRENTLY keeps offers writable while it builds; run it outside a transaction
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_offers_shop_created_id
+ON offers(shop_id, created_at DESC, id DESC);
+
+-- Verify the index
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'offers'
+ORDER BY indexname;
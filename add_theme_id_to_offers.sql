@@ -0,0 +1,33 @@
+-- Store the theme an offer references as an indexed column instead of
+-- searching the theme JSON text
+ALTER TABLE offers
+ADD COLUMN IF NOT EXISTS theme_id INTEGER;
+
+-- Backfill from theme->'id' with the rule offer_theme_id applies to new writes:
+-- a number or a numeric string between 1 and 2147483647. The nested CASE keeps
+-- non-numeric ids away from the numeric cast and out-of-range ones away from
+-- the integer cast. Rows an earlier run of this script resolved differently
+-- are corrected too
+UPDATE offers AS o
+SET theme_id = v.theme_id
+FROM (
+    SELECT id,
+           CASE WHEN theme->>'id' ~ '^[0-9]+$' THEN
+               CASE WHEN (theme->>'id')::numeric BETWEEN 1 AND 2147483647
+                    THEN (theme->>'id')::integer END
+           END AS theme_id
+    FROM offers
+    WHERE theme IS NOT NULL
+) AS v
+WHERE o.id = v.id
+  AND o.theme_id IS DISTINCT FROM v.theme_id;
+
+-- CONCURRENTLY keeps offers writable while it builds; run it outside a transaction
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_offers_shop_theme_id
+ON offers(shop_id, theme_id);
+
+-- Verify the backfill
+SELECT COUNT(*) AS offers_with_theme,
+       COUNT(theme_id) AS offers_with_theme_id
+FROM offers
+WHERE theme IS NOT NULL;
@@ -0,0 +1,14 @@
+-- Add updated_at to offer_layouts; rendered offers are cached per layout version
+ALTER TABLE offer_layouts
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT now();
+
+-- Keep it current on every update, like the other tables
+DROP TRIGGER IF EXISTS update_offer_layouts_updated_at ON offer_layouts;
+CREATE TRIGGER update_offer_layouts_updated_at BEFORE UPDATE ON offer_layouts
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Verify the changes
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'offer_layouts'
+ORDER BY ordinal_position;
@@ -9,13 +9,18 @@ from .routes.shops import shops_bp
 from .routes.images import images_bp
 from .routes.webhooks import webhooks_bp
 from .routes.proxy import proxy_bp
-from .models.database import get_db
+from .routes.admin import admin_bp
+from .models.database import get_db, close_request_db
+from .utils.request_profiler import init_request_profiler
 from sqlalchemy import text
 
 def create_app():
     app = Flask(__name__, static_folder='static', template_folder='templates')
     app.config.from_object(Config)
 
+    # SQL, Shopify and serialization timings as Server-Timing headers and sampled logs
+    init_request_profiler(app)
+
     # Initialize CORS for the entire application (broad dev policy for tunnels)
     CORS(
         app,
@@ -47,6 +52,9 @@ def create_app():
             app.logger.warning(f"Blocked suspicious path: {request.path} from IP {request.remote_addr}")
             return "Access Denied", 403
 
+    # Return the request's pooled connections once the response is built
+    app.teardown_request(close_request_db)
+
     # Register blueprints
     app.register_blueprint(offers_bp, url_prefix='/api')
     app.register_blueprint(themes_bp, url_prefix='/api')
@@ -55,6 +63,7 @@ def create_app():
     app.register_blueprint(images_bp, url_prefix='/api')
     app.register_blueprint(webhooks_bp, url_prefix='/api/webhooks')
     app.register_blueprint(proxy_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
     @app.route('/health')
     def health_check():
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+from . import create_app
+from .config import Config
+from .models.async_database import init_async_engines, dispose_async_engines, get_async_db
+from .routes.offers import (
+    parse_pricing_request, lookup_pricing_quote, build_pricing_quote, pricing_response_body, pricing_response_etag,
+    parse_batch_pricing_request, batch_pricing_response_body, offer_bundle_response_body
+)
+from .services.band_index import band_index, band_history_index, BandIndexUnavailable
+from .services.offer_bundle_cache import offer_bundle_cache
+from .utils.auth import SHOP_AUTH_QUERY, check_cached_shop, check_shop_row
+
+logger = logging.getLogger(__name__)
+
+# Same policy Flask-CORS applies to /api/* in create_app
+STOREFRONT_CORS = [Middleware(
+    CORSMiddleware,
+    allow_origins=['*'],
+    allow_methods=['GET', 'POST', 'OPTIONS', 'PATCH', 'DELETE'],
+    allow_headers=['Content-Type', 'Authorization', 'X-Shop-Domain', 'X-API-Key']
+)]
+
+
+def create_async_app():
+    """Async storefront app.
+
+    The pricing and offer bundle endpoints run on the event loop against the
+    async engine, sharing the models, band indexes and quote, shop and offer
+    bundle caches with the Flask app. Every other route is served by the Flask app on a thread pool.
+    """
+    routes = [
+        Route('/api/pricing', get_dynamic_pricing, methods=['GET', 'POST', 'OPTIONS'],
+              middleware=STOREFRONT_CORS),
+        Route('/api/pricing/batch', get_batch_pricing, methods=['POST', 'OPTIONS'],
+              middleware=STOREFRONT_CORS),
+        Route('/api/offer-bundle', get_offer_bundle, methods=['GET', 'OPTIONS'],
+              middleware=STOREFRONT_CORS),
+        Mount('/', app=WSGIMiddleware(create_app(), workers=Config.ASYNC_WSGI_THREADS))
+    ]
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    init_async_engines()
+    for index in (band_index, band_history_index):
+        # From here on lookups only read the loaded snapshot; reloads happen in the background
+        index.background_refresh = True
+        await _refresh_index(index)
+    refresher = asyncio.create_task(_refresh_band_indexes())
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        for index in (band_index, band_history_index):
+            index.background_refresh = False
+        await dispose_async_engines()
+
+
+async def _refresh_band_indexes():
+    """Keep the band indexes fresh off the request path, so lookups never block the loop on a reload.
+
+    Each index is re-read every ttl / 2 seconds, and every second while it has
+    nothing loaded or was invalidated.
+    """
+    while True:
+        await asyncio.sleep(1)
+        for index in (band_index, band_history_index):
+            if index.due_for_refresh(max(index.ttl / 2, 1)):
+                await _refresh_index(index)
+
+
+async def _refresh_index(index):
+    try:
+        async with get_async_db(readonly=True) as db:
+            await index.refresh_async(db)
+    except Exception as e:
+        # Lookups keep the last loaded bands (or get a 503 until a first load succeeds)
+        logger.error(f"Error loading pricing bands: {str(e)}")
+
+
+async def resolve_shop_async(shop_domain, api_key):
+    """Async resolve_shop: the same shop cache, and one SELECT on a miss.
+
+    Returns (shop, None) or (None, (error message, HTTP status)).
+    """
+    provided_key = (api_key or '').strip()
+    shop, failure = check_cached_shop(shop_domain, provided_key)
+    if shop is None and failure is None:
+        async with get_async_db(readonly=True, replica=False) as db:
+            result = (await db.execute(SHOP_AUTH_QUERY, {'shop_url': shop_domain})).mappings().first()
+        shop, failure = check_shop_row(shop_domain, provided_key, result)
+    return shop, failure
+
+
+async def get_dynamic_pricing(request):
+    """Async /api/pricing; same request and response contract as the Flask route"""
+    if request.method == 'OPTIONS':
+        return Response(status_code=200)
+    try:
+        api_key = request.headers.get('X-API-Key')
+        if not api_key:
+            return _error('Missing API key', 401)
+
+        data = request.query_params if request.method == 'GET' else await _read_json(request)
+
+        pricing_request, failure = parse_pricing_request(data)
+        if failure:
+            return _error(*failure)
+        shop_domain = request.headers.get('X-Shop-Domain')
+
+        # The key is checked before any quote is served; a cached shop costs no await
+        shop, failure = await resolve_shop_async(shop_domain, api_key)
+        if failure:
+            return _error(*failure)
+
+        lookup = lookup_pricing_quote(pricing_request, shop_domain, api_key)
+        quote = lookup.quote or build_pricing_quote(pricing_request, lookup, shop)
+        if quote is None:
+            return _error('No pricing found for this product', 404)
+
+        etag = pricing_response_etag(pricing_request, quote)
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': f'private, max-age={Config.PRICING_QUOTE_MAX_AGE}',
+            'Vary': 'X-Shop-Domain, X-API-Key'
+        }
+        if request.method == 'GET' and _etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(pricing_response_body(pricing_request, quote), headers=headers)
+
+    except BandIndexUnavailable as e:
+        logger.warning(str(e))
+        return _error('Pricing is temporarily unavailable', 503)
+    except Exception as e:
+        logger.error(f"Dynamic pricing error: {str(e)}")
+        return _error('Failed to get pricing', 500)
+
+
+async def get_batch_pricing(request):
+    """Async /api/pricing/batch; same request and response contract as the Flask route"""
+    if request.method == 'OPTIONS':
+        return Response(status_code=200)
+    try:
+        api_key = request.headers.get('X-API-Key')
+        if not api_key:
+            return _error('Missing API key', 401)
+
+        batch_request, failure = parse_batch_pricing_request(await _read_json(request))
+        if failure:
+            return _error(*failure)
+
+        shop, failure = await resolve_shop_async(request.headers.get('X-Shop-Domain'), api_key)
+        if failure:
+            return _error(*failure)
+
+        return JSONResponse(batch_pricing_response_body(batch_request, shop))
+
+    except BandIndexUnavailable as e:
+        logger.warning(str(e))
+        return _error('Pricing is temporarily unavailable', 503)
+    except Exception as e:
+        logger.error(f"Batch pricing error: {str(e)}")
+        return _error('Failed to get pricing', 500)
+
+
+async def get_offer_bundle(request):
+    """Async /api/offer-bundle; same request and response contract as the Flask route.
+
+    Offer, theme, layout and settings writes go through the mounted Flask app
+    in this process, so they invalidate the same snapshot cache.
+    """
+    if request.method == 'OPTIONS':
+        return Response(status_code=200)
+    try:
+        api_key = request.headers.get('X-API-Key')
+        if not api_key:
+            return _error('Missing API key', 401)
+        shop_domain = request.headers.get('X-Shop-Domain')
+
+        shop, failure = await resolve_shop_async(shop_domain, api_key)
+        if failure:
+            return _error(*failure)
+
+        bundle = offer_bundle_cache.get(shop.id)
+        if bundle is None:
+            async with get_async_db(readonly=True, replica=False) as db:
+                bundle = await offer_bundle_cache.load_async(db, shop.id)
+        body, etag = offer_bundle_response_body(bundle, request.query_params, shop_domain, api_key, shop)
+
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': 'private, no-cache',
+            'Vary': 'X-Shop-Domain, X-API-Key'
+        }
+        if _etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(body, headers=headers)
+
+    except BandIndexUnavailable as e:
+        logger.warning(str(e))
+        return _error('Pricing is temporarily unavailable', 503)
+    except Exception as e:
+        logger.error(f"Offer bundle error: {str(e)}")
+        return _error('Failed to get offer bundle', 500)
+
+
+async def _read_json(request):
+    # Be tolerant of clients missing the JSON content-type, like the Flask routes
+    try:
+        body = await request.body()
+        return json.loads(body) if body else {}
+    except ValueError:
+        return {}
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or any(candidate.removeprefix('W/') == f'"{etag}"' for candidate in candidates)
+
+
+def _error(message, status):
+    return JSONResponse({'error': message}, status_code=status)
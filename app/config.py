@@ -8,6 +8,15 @@ load_dotenv()
 class Config:
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL')
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')  # Optional read replica for read-only handlers
+    DATABASE_REPLICA_RETRY = int(os.getenv('DATABASE_REPLICA_RETRY', '30'))  # Seconds on the primary after a replica failure
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '3'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '10'))  # Seconds to wait for a pooled connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '180'))  # Seconds before a connection is replaced
+    ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '5'))  # Async storefront app (main_async.py) pool
+    ASYNC_DB_MAX_OVERFLOW = int(os.getenv('ASYNC_DB_MAX_OVERFLOW', '5'))
+    ASYNC_WSGI_THREADS = int(os.getenv('ASYNC_WSGI_THREADS', '8'))  # Threads serving the Flask routes under main_async.py
 
     # Shopify settings
     SHOPIFY_WEBHOOK_SECRET = os.environ.get('SHOPIFY_WEBHOOK_SECRET')
@@ -21,6 +30,36 @@ class Config:
     SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
     EMAIL_FROM_ADDRESS = os.environ.get('EMAIL_FROM_ADDRESS')
 
+    # Pricing
+    PRICING_INDEX_TTL = int(os.getenv('PRICING_INDEX_TTL', '300'))  # Seconds between active band checks
+    PRICING_BATCH_MAX_ITEMS = int(os.getenv('PRICING_BATCH_MAX_ITEMS', '250'))
+    PRICING_QUOTE_CACHE_TTL = int(os.getenv('PRICING_QUOTE_CACHE_TTL', '60'))  # Seconds a cached quote is served
+    PRICING_QUOTE_CACHE_SIZE = int(os.getenv('PRICING_QUOTE_CACHE_SIZE', '10000'))
+    PRICING_QUOTE_MAX_AGE = int(os.getenv('PRICING_QUOTE_MAX_AGE', '60'))  # Cache-Control max-age for quotes
+
+    # Offers
+    OFFERS_PAGE_SIZE = int(os.getenv('OFFERS_PAGE_SIZE', '50'))  # Default GET /api/offers page size
+    OFFERS_PAGE_MAX = int(os.getenv('OFFERS_PAGE_MAX', '200'))
+    OFFERS_BULK_MAX_OPERATIONS = int(os.getenv('OFFERS_BULK_MAX_OPERATIONS', '500'))  # Per POST /api/offers/bulk
+    OFFER_BUNDLE_CACHE_TTL = int(os.getenv('OFFER_BUNDLE_CACHE_TTL', '60'))  # Seconds a storefront snapshot is served
+    OFFER_BUNDLE_CACHE_SIZE = int(os.getenv('OFFER_BUNDLE_CACHE_SIZE', '1000'))
+
+    # Layouts
+    LAYOUT_TEMPLATE_CACHE_SIZE = int(os.getenv('LAYOUT_TEMPLATE_CACHE_SIZE', '500'))  # Compiled layout templates
+    LAYOUT_RENDER_CACHE_SIZE = int(os.getenv('LAYOUT_RENDER_CACHE_SIZE', '2000'))  # Offers rendered into layouts
+
+    # Auth
+    SHOP_AUTH_CACHE_TTL = int(os.getenv('SHOP_AUTH_CACHE_TTL', '60'))  # Seconds a cached shop API key is trusted
+    SHOP_AUTH_CACHE_SIZE = int(os.getenv('SHOP_AUTH_CACHE_SIZE', '1000'))
+    SHOP_AUTH_RECHECK_INTERVAL = float(os.getenv('SHOP_AUTH_RECHECK_INTERVAL', '1'))  # Min seconds between key re-reads per shop
+
+    # Admin
+    ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN')  # Bearer token for /api/admin; unset disables it
+
+    # Profiling
+    REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'false').lower() == 'true'  # Server-Timing on every response
+    REQUEST_PROFILING_SAMPLE_RATE = float(os.getenv('REQUEST_PROFILING_SAMPLE_RATE', '0.01'))  # Share of profiles logged
+
     # Legacy static API token (unused)
     # API_TOKEN = os.getenv('API_TOKEN')
 
@@ -0,0 +1,120 @@
+# models/async_database.py
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from contextlib import asynccontextmanager
+import logging
+import time
+from ..config import Config
+from .database import READONLY_EXECUTION_OPTIONS
+from .pool_metrics import PoolMetrics
+
+logger = logging.getLogger(__name__)
+
+# Async drivers for the sync URLs in DATABASE_URL / DATABASE_REPLICA_URL
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def _create_async_engine(url, target_session_attrs):
+    """Create the async counterpart of database._create_engine on asyncpg"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    connect_args = {}
+    if backend == 'postgresql':
+        # asyncpg takes SSL through connect_args rather than libpq's sslmode
+        url = url.difference_update_query(['sslmode'])
+        connect_args = {
+            "timeout": 5,  # Connection timeout after 5 seconds
+            "server_settings": {
+                "application_name": "flex-warranty-api-async",  # Help identify connections in Supabase
+                "statement_timeout": "5000"  # 5 second statement timeout
+            },
+            "ssl": "require",  # Force SSL connection
+            "target_session_attrs": target_session_attrs
+        }
+
+    return create_async_engine(
+        url.set(drivername=ASYNC_DRIVERS.get(backend, url.drivername)),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_pre_ping=True,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_size=Config.ASYNC_DB_POOL_SIZE,
+        max_overflow=Config.ASYNC_DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_use_lifo=True,
+        connect_args=connect_args
+    )
+
+
+# Created when the async app starts, so importing this module never connects
+async_engine = None
+async_replica_engine = None
+AsyncSessionFactory = None
+AsyncReplicaSessionFactory = None
+
+async_pool_metrics = PoolMetrics()
+
+# After a failed replica checkout, reads use the primary until this monotonic time
+_replica_retry_at = 0.0
+
+
+def init_async_engines():
+    """Create the async engines and session factories for this process"""
+    global async_engine, async_replica_engine, AsyncSessionFactory, AsyncReplicaSessionFactory
+
+    if async_engine is not None:
+        return
+
+    async_engine = _create_async_engine(Config.DATABASE_URL, "read-write")
+    async_pool_metrics.attach(async_engine.sync_engine)
+    AsyncSessionFactory = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+    if Config.DATABASE_REPLICA_URL:
+        async_replica_engine = _create_async_engine(Config.DATABASE_REPLICA_URL, "any")
+        AsyncReplicaSessionFactory = async_sessionmaker(async_replica_engine, expire_on_commit=False, autoflush=False)
+
+
+async def dispose_async_engines():
+    for engine in (async_engine, async_replica_engine):
+        if engine is not None:
+            await engine.dispose()
+
+
+@asynccontextmanager
+async def get_async_db(readonly=False, replica=True):
+    """Async get_db: commits on success, rolls back on error.
+
+    readonly and replica behave as in get_db: autocommit without a COMMIT, on
+    the read replica when one is configured and reachable.
+    """
+    db = await _open_async_session(readonly, replica)
+    try:
+        yield db
+        if not readonly:
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+async def _open_async_session(readonly, replica):
+    global _replica_retry_at
+
+    if readonly and replica and AsyncReplicaSessionFactory is not None and time.monotonic() >= _replica_retry_at:
+        db = AsyncReplicaSessionFactory()
+        try:
+            await db.connection(execution_options=READONLY_EXECUTION_OPTIONS)
+            return db
+        except DBAPIError as e:
+            logger.warning(f"Read replica unavailable, using primary for {Config.DATABASE_REPLICA_RETRY}s: {str(e)}")
+            _replica_retry_at = time.monotonic() + Config.DATABASE_REPLICA_RETRY
+            await db.close()
+
+    db = AsyncSessionFactory()
+    if readonly:
+        await db.connection(execution_options=READONLY_EXECUTION_OPTIONS)
+    return db
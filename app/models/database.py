@@ -1,12 +1,17 @@
 # models/database.py
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, JSON, Boolean, Text, text, DECIMAL
-from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base, relationship
-from sqlalchemy.engine import Engine
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, JSON, Boolean, Text, text, DECIMAL, Index
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base, relationship, Session as OrmSession
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
+from flask import g, has_request_context
 from datetime import datetime
 import logging
+import threading
+import time
 from ..config import Config
+from .pool_metrics import PoolMetrics, InstrumentedQueuePool
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -18,28 +23,121 @@ logger = logging.getLogger(__name__)
 # Create declarative base
 Base = declarative_base()
 
-# Configure engine with optimized settings for Supabase
-engine = create_engine(
-    Config.DATABASE_URL,
-    pool_pre_ping=True,  # Check connection before using
-    pool_recycle=180,    # Recycle connections every 3 minutes
-    pool_size=3,         # Smaller pool size to prevent exhaustion
-    max_overflow=5,      # Allow some overflow for peak times
-    pool_timeout=10,     # Timeout after 10 seconds
-    pool_use_lifo=True,  # Use LIFO to reduce number of connections in use
-    connect_args={
-        "connect_timeout": 5,  # Connection timeout after 5 seconds
-        "application_name": "flex-warranty-api",  # Help identify connections in Supabase
-        "options": "-c statement_timeout=5000",  # 5 second statement timeout
-        "sslmode": "require",  # Force SSL connection
-        "gssencmode": "disable",  # Disable GSSAPI encryption
-        "target_session_attrs": "read-write"  # Ensure we connect to a writable instance
-    }
-)
+def _create_engine(url, target_session_attrs):
+    """Create a pooled engine with optimized settings for Supabase"""
+    connect_args = {}
+    if make_url(url).get_backend_name() == 'postgresql':
+        connect_args = {
+            "connect_timeout": 5,  # Connection timeout after 5 seconds
+            "application_name": "flex-warranty-api",  # Help identify connections in Supabase
+            "options": "-c statement_timeout=5000",  # 5 second statement timeout
+            "sslmode": "require",  # Force SSL connection
+            "gssencmode": "disable",  # Disable GSSAPI encryption
+            "target_session_attrs": target_session_attrs
+        }
+
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,  # QueuePool that times checkout waits
+        pool_pre_ping=True,  # Check connection before using
+        pool_recycle=Config.DB_POOL_RECYCLE,    # Recycle connections every 3 minutes by default
+        pool_size=Config.DB_POOL_SIZE,          # Smaller pool size to prevent exhaustion
+        max_overflow=Config.DB_MAX_OVERFLOW,    # Allow some overflow for peak times
+        pool_timeout=Config.DB_POOL_TIMEOUT,    # Seconds to wait for a connection
+        pool_use_lifo=True,  # Use LIFO to reduce number of connections in use
+        connect_args=connect_args
+    )
+
+
+# Engines are created on first use rather than at import, so importing the
+# models needs no DATABASE_URL and a preloading server never forks a live pool
+_engines = {}
+_engines_lock = threading.Lock()
+
+# Pool event instrumentation, served by the admin metrics endpoint
+pool_metrics = PoolMetrics()
+replica_pool_metrics = PoolMetrics()
+
+
+def get_engine():
+    """The primary engine; ensure we connect to a writable instance"""
+    return _get_or_create_engine('primary', Config.DATABASE_URL, "read-write", pool_metrics)
+
+
+def get_replica_engine():
+    """The optional read replica engine for read-only handlers, or None"""
+    if not Config.DATABASE_REPLICA_URL:
+        return None
+    return _get_or_create_engine('replica', Config.DATABASE_REPLICA_URL, "any", replica_pool_metrics)
+
+
+def _get_or_create_engine(name, url, target_session_attrs, metrics):
+    engine = _engines.get(name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                if not url:
+                    raise RuntimeError(f"No database URL configured for the {name} engine")
+                engine = _create_engine(url, target_session_attrs)
+                metrics.attach(engine)
+                _engines[name] = engine
+    return engine
+
+
+def reset_engines_after_fork():
+    """Drop pools inherited from a parent process without closing its connections.
+
+    Call first thing in a forked worker (gunicorn post_fork); the engines are
+    kept, and each builds a fresh pool on its next checkout.
+    """
+    for engine in list(_engines.values()):
+        engine.dispose(close=False)
+
+
+def dispose_engines():
+    """Close every pooled connection; the engines reconnect on their next checkout"""
+    for engine in list(_engines.values()):
+        engine.dispose()
+
+
+def warm_pools():
+    """Open pool_size connections per engine, so the first requests skip TLS and auth"""
+    for engine in (get_engine(), get_replica_engine()):
+        if engine is None:
+            continue
+        connections = []
+        try:
+            for _ in range(engine.pool.size()):
+                connections.append(engine.connect())
+        except Exception as e:
+            logger.warning(f"Pool warmup stopped after {len(connections)} connections: {str(e)}")
+        finally:
+            for connection in connections:
+                connection.close()
+
+
+class _PrimarySession(OrmSession):
+    """Session bound lazily to the primary engine unless given an explicit bind"""
+
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            return get_engine()
+        return super().get_bind(*args, **kwargs)
+
+
+class _ReplicaSession(OrmSession):
+    """Session bound lazily to the replica engine unless given an explicit bind"""
+
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            return get_replica_engine()
+        return super().get_bind(*args, **kwargs)
+
 
 # Create session factory with shorter timeout
 SessionFactory = sessionmaker(
-    bind=engine,
+    class_=_PrimarySession,
     expire_on_commit=False,  # Prevent expired object issues
     autocommit=False,
     autoflush=False
@@ -48,21 +146,195 @@ SessionFactory = sessionmaker(
 # Use scoped session with proper cleanup
 Session = scoped_session(SessionFactory)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Replica sessions get their own registry so they never share a primary session
+ReplicaSession = scoped_session(sessionmaker(
+    class_=_ReplicaSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+)) if Config.DATABASE_REPLICA_URL else None
+
+SessionLocal = sessionmaker(class_=_PrimarySession, autocommit=False, autoflush=False)
+
+# No BEGIN/COMMIT around read-only units of work
+READONLY_EXECUTION_OPTIONS = {'isolation_level': 'AUTOCOMMIT'}
+
+# After a failed replica checkout, reads use the primary until this monotonic time
+_replica_retry_at = 0.0
 
 @contextmanager
-def get_db():
-    db = Session()
+def get_db(readonly=False, replica=True):
+    """Yield a session that commits on success and rolls back on error.
+
+    readonly=True runs the session's connection in autocommit mode and skips the
+    COMMIT, saving a round trip on pure SELECT handlers. It also uses the read
+    replica when one is configured and reachable, falling back to the primary;
+    pass replica=False where the handler must read its own writes. Only use
+    readonly from handlers that never write.
+
+    Inside a Flask request every get_db block shares the request's unit of work
+    (one pooled connection per database, closed in teardown_request); a block
+    nested in another joins the outer one and leaves the commit to it.
+    """
+    unit = _request_unit()
+    scope = unit.scope(readonly, replica) if unit is not None else _standalone_scope(readonly, replica)
+    with scope as db:
+        yield db
+
+
+@contextmanager
+def _standalone_scope(readonly, replica):
+    db, registry = _open_session(readonly, replica)
     try:
         yield db
-        db.commit()
+        if not readonly:
+            db.commit()
     except Exception as e:
         logger.error(f"Database error: {str(e)}")
         db.rollback()
         raise
     finally:
         db.close()
-        Session.remove()
+        registry.remove()
+
+
+def _open_session(readonly, replica):
+    if readonly and replica and ReplicaSession is not None and time.monotonic() >= _replica_retry_at:
+        db = ReplicaSession()
+        try:
+            # Check out now so an unreachable replica falls back before the handler runs
+            db.connection(execution_options=READONLY_EXECUTION_OPTIONS)
+            return db, ReplicaSession
+        except DBAPIError as e:
+            _replica_unavailable(e)
+            db.close()
+            ReplicaSession.remove()
+
+    db = Session()
+    if readonly:
+        db.connection(execution_options=READONLY_EXECUTION_OPTIONS)
+    return db, Session
+
+
+def _replica_unavailable(error):
+    global _replica_retry_at
+    logger.warning(f"Read replica unavailable, using primary for {Config.DATABASE_REPLICA_RETRY}s: {str(error)}")
+    _replica_retry_at = time.monotonic() + Config.DATABASE_REPLICA_RETRY
+
+
+class RequestUnitOfWork:
+    """The database sessions of one Flask request.
+
+    Each database (primary, replica) gets one connection, checked out on the
+    first get_db block that needs it and held until teardown_request, so
+    require_auth, the handler and its helpers share a single pool checkout.
+    Each top-level block still ends its own transaction: writes commit, reads
+    run in autocommit and end without a COMMIT. Handlers that call out to
+    slow external services call release_request_db() first, so the checkout
+    is not held across the HTTP round trip; a later get_db block reopens it.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._readonly = {}
+        self._active = None
+
+    @contextmanager
+    def scope(self, readonly, replica):
+        if self._active is not None:
+            yield self._active
+            return
+
+        db = self._session(readonly, replica)
+        self._active = db
+        try:
+            yield db
+            if readonly:
+                # Ends the session's transaction; a no-op on the wire in autocommit
+                db.rollback()
+            else:
+                db.commit()
+        except Exception as e:
+            logger.error(f"Database error: {str(e)}")
+            db.rollback()
+            raise
+        finally:
+            self._active = None
+
+    def _session(self, readonly, replica):
+        if readonly and replica and ReplicaSession is not None and time.monotonic() >= _replica_retry_at:
+            db = self._sessions.get('replica') or self._open('replica', ReplicaSession)
+            if db is not None:
+                return self._prepare('replica', db, readonly)
+
+        db = self._sessions.get('primary') or self._open('primary', Session)
+        return self._prepare('primary', db, readonly)
+
+    def _open(self, target, registry):
+        # The registry's bind, so Session.configure(bind=...) still redirects requests
+        bind = registry.session_factory.kw.get('bind') or (get_replica_engine() if target == 'replica' else get_engine())
+        try:
+            connection = bind.connect()
+        except DBAPIError as e:
+            if target != 'replica':
+                raise
+            _replica_unavailable(e)
+            return None
+
+        db = registry.session_factory(bind=connection)
+        self._sessions[target] = db
+        return db
+
+    def _prepare(self, target, db, readonly):
+        # Switching autocommit is local driver state, so alternating blocks cost no round trips
+        if self._readonly.get(target) != readonly:
+            connection = db.get_bind()
+            connection.execution_options(
+                isolation_level='AUTOCOMMIT' if readonly else connection.default_isolation_level
+            )
+            self._readonly[target] = readonly
+        return db
+
+    def close(self):
+        for db in self._sessions.values():
+            connection = db.get_bind()
+            db.close()
+            connection.close()
+        self._sessions.clear()
+        self._readonly.clear()
+
+    def release(self):
+        # Inside a get_db block the connection is still in use
+        if self._active is not None:
+            raise RuntimeError('release_request_db() called inside a get_db block')
+        self.close()
+
+
+def _request_unit():
+    if not has_request_context():
+        return None
+    unit = g.get('_db_unit')
+    if unit is None:
+        unit = g._db_unit = RequestUnitOfWork()
+    return unit
+
+
+def release_request_db():
+    """Return the request's connections to the pool before a slow external call.
+
+    Objects loaded so far stay usable (detached, with their loaded attributes);
+    the next get_db block in the request checks out a fresh connection.
+    """
+    unit = g.get('_db_unit') if has_request_context() else None
+    if unit is not None:
+        unit.release()
+
+
+def close_request_db(exception=None):
+    """teardown_request hook: return the request's connections to the pool"""
+    unit = g.pop('_db_unit', None)
+    if unit is not None:
+        unit.close()
 
 
 class Shop(Base):
@@ -111,16 +383,38 @@ class Offer(Base):
     button_text = Column(String(255))
     button_url = Column(Text)
     theme = Column(JSON)  # Stores theme settings
+    theme_id = Column(Integer)  # offer_themes id referenced by theme, see offer_theme_id
     layout_id = Column(Integer, ForeignKey('offer_layouts.id'))
     status = Column(String(50), default='active')  # active, inactive, draft
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Keyset pagination for GET /api/offers: newest first within a shop
+    __table_args__ = (
+        Index('idx_offers_shop_created_id', shop_id, created_at.desc(), id.desc()),
+        # Theme usage counts and the in-use check before a theme is deleted
+        Index('idx_offers_shop_theme_id', shop_id, theme_id),
+    )
+
     # Relationships
     shop = relationship('Shop', back_populates='offers')
     layout = relationship('OfferLayout')
 
 
+def offer_theme_id(theme):
+    """The offer_themes id an offer's theme settings reference ({"id": 3, ...}), or None.
+
+    Stored in offers.theme_id whenever theme is written. It is not a foreign
+    key: theme settings may name a theme that was since deleted, as before.
+    """
+    theme_id = theme.get('id') if isinstance(theme, dict) else None
+    if isinstance(theme_id, str) and theme_id.isascii() and theme_id.isdigit():
+        theme_id = int(theme_id)
+    if not isinstance(theme_id, int) or isinstance(theme_id, bool) or not 0 < theme_id < 2 ** 31:
+        return None
+    return theme_id
+
+
 class OfferTheme(Base):
     __tablename__ = 'offer_themes'
 
@@ -147,6 +441,7 @@ class OfferLayout(Base):
     css_classes = Column(Text)
     preview_html = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     shop = relationship('Shop', back_populates='layouts')
@@ -187,4 +482,4 @@ class WarrantyPricingBand(Base):
 
 # Initialize database
 def init_db():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=get_engine()) 
\ No newline at end of file
@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+from collections import Counter
+
+from flask import has_request_context, request
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds (ms) of the checkout wait histogram buckets; the last bucket is open-ended
+CHECKOUT_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    """Connection pool counters fed by pool events.
+
+    Tracks how long checkouts wait for a connection, checked-out and overflow
+    counts (current and peak), checkouts per Flask endpoint, pool timeouts and
+    connections invalidated by pool_pre_ping.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.wait_buckets = [0] * (len(CHECKOUT_WAIT_BUCKETS_MS) + 1)
+            self.wait_count = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.timeouts = 0
+            self.checkouts_by_endpoint = Counter()
+            self.connects = 0
+            self.pre_ping_invalidations = 0
+            self.other_invalidations = 0
+            self.peak_checked_out = 0
+            self.peak_overflow = 0
+
+    def record_wait(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.wait_buckets[bisect.bisect_left(CHECKOUT_WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.wait_count += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def attach(self, engine):
+        """Register the pool event listeners on an engine and start timing its checkouts"""
+        pool = engine.pool
+        if isinstance(pool, InstrumentedQueuePool):
+            pool.metrics = self
+
+        @event.listens_for(pool, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, 'checkout')
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            endpoint = (request.endpoint or request.path) if has_request_context() else '<no request>'
+            # engine.pool, not the pool above, which engine.dispose() replaces
+            current_pool = engine.pool
+            checked_out = current_pool.checkedout()
+            overflow = max(current_pool.overflow(), 0) if hasattr(current_pool, 'overflow') else 0
+            with self._lock:
+                self.checkouts_by_endpoint[endpoint] += 1
+                self.peak_checked_out = max(self.peak_checked_out, checked_out)
+                self.peak_overflow = max(self.peak_overflow, overflow)
+
+        @event.listens_for(pool, 'invalidate')
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                # A failed pre-ping surfaces as a DisconnectionError raised during checkout
+                if isinstance(exception, exc.DisconnectionError):
+                    self.pre_ping_invalidations += 1
+                else:
+                    self.other_invalidations += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            # A list keeps bucket order through jsonify, which sorts dict keys
+            buckets = [{'le_ms': bound, 'count': count}
+                       for bound, count in zip(CHECKOUT_WAIT_BUCKETS_MS + (None,), self.wait_buckets)]
+            return {
+                'pool': {
+                    'class': type(pool).__name__,
+                    'size': pool.size() if hasattr(pool, 'size') else None,
+                    'max_overflow': getattr(pool, '_max_overflow', None),
+                    'timeout': pool.timeout() if hasattr(pool, 'timeout') else None,
+                    'checked_out': pool.checkedout(),
+                    'checked_in': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+                    'overflow': max(pool.overflow(), 0) if hasattr(pool, 'overflow') else None,
+                    'peak_checked_out': self.peak_checked_out,
+                    'peak_overflow': self.peak_overflow
+                },
+                'checkout_wait': {
+                    'count': self.wait_count,
+                    'mean_ms': round(self.wait_total_ms / self.wait_count, 3) if self.wait_count else 0.0,
+                    'max_ms': round(self.wait_max_ms, 3),
+                    'timeouts': self.timeouts,
+                    'buckets': buckets
+                },
+                'checkouts_by_endpoint': dict(self.checkouts_by_endpoint.most_common()),
+                'connects': self.connects,
+                'invalidations': {
+                    'pre_ping': self.pre_ping_invalidations,
+                    'other': self.other_invalidations
+                }
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection.
+
+    Pool events fire once a connection is handed out, so the wait (queueing
+    plus opening a new connection when the pool grows) is timed around _do_get.
+    """
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self._record_wait(started, timed_out=True)
+            raise
+        self._record_wait(started)
+        return connection
+
+    def _record_wait(self, started: float, timed_out: bool = False):
+        if self.metrics is not None:
+            self.metrics.record_wait((time.perf_counter() - started) * 1000, timed_out)
+
+    def recreate(self):
+        # Keep reporting into the same metrics after engine.dispose()
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
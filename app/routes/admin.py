@@ -0,0 +1,33 @@
+from flask import Blueprint, jsonify
+from ..utils.auth import require_admin
+from ..models.database import get_engine, get_replica_engine, pool_metrics, replica_pool_metrics
+from ..services.shop_auth_cache import shop_auth_cache
+from ..services.offer_bundle_cache import offer_bundle_cache
+from ..services.layout_templates import layout_renderer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Create the Blueprint
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.route('/metrics', methods=['GET'])
+@require_admin
+def get_metrics():
+    """Get this worker's connection pool and cache metrics"""
+    try:
+        replica_engine = get_replica_engine()
+        return jsonify({
+            'db_pool': pool_metrics.snapshot(get_engine().pool),
+            'db_replica_pool': replica_pool_metrics.snapshot(replica_engine.pool) if replica_engine is not None else None,
+            'caches': {
+                'shop_auth': shop_auth_cache.stats(),
+                'offer_bundle': offer_bundle_cache.stats(),
+                'layout_renders': layout_renderer.stats()
+            }
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Get metrics error: {str(e)}")
+        return jsonify({'error': 'Failed to get metrics'}), 500
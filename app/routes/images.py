@@ -16,7 +16,7 @@ def _validate_image(image_bytes: bytes):
 @images_bp.route('/images/<int:image_id>/display', methods=['GET'])
 def display_image(image_id: int):
     try:
-        with get_db() as db:
+        with get_db(readonly=True) as db:
             row = db.execute(
                 text('SELECT data, content_type FROM offer_images WHERE id = :id'),
                 {'id': image_id}
@@ -37,7 +37,7 @@ def display_image(image_id: int):
 def list_images():
     try:
         ctx = get_shop_context()
-        with get_db() as db:
+        with get_db(readonly=True) as db:
             rows = db.execute(
                 text('''
                     SELECT id, filename, content_type, created_at
@@ -4,6 +4,8 @@ import json
 from datetime import datetime
 from ..utils.auth import require_auth, get_shop_context
 from ..models.database import get_db
+from ..services.offer_bundle_cache import offer_bundle_cache
+from ..services.layout_templates import layout_renderer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,7 +21,7 @@ def list_layouts():
     try:
         shop_context = get_shop_context()
         
-        with get_db() as db:
+        with get_db(readonly=True) as db:
             result = db.execute(
                 text('''
                     SELECT * FROM offer_layouts
@@ -33,6 +35,7 @@ def list_layouts():
             for row in result:
                 layout = dict(row)
                 layout['created_at'] = layout['created_at'].isoformat() if layout['created_at'] else None
+                layout['updated_at'] = layout['updated_at'].isoformat() if layout['updated_at'] else None
                 layouts.append(layout)
             
             return jsonify({'layouts': layouts}), 200
@@ -49,7 +52,7 @@ def get_layout(layout_id):
     try:
         shop_context = get_shop_context()
         
-        with get_db() as db:
+        with get_db(readonly=True, replica=False) as db:
             result = db.execute(
                 text('''
                     SELECT * FROM offer_layouts
@@ -66,6 +69,7 @@ def get_layout(layout_id):
             
             layout = dict(result)
             layout['created_at'] = layout['created_at'].isoformat() if layout['created_at'] else None
+            layout['updated_at'] = layout['updated_at'].isoformat() if layout['updated_at'] else None
             
             return jsonify({'layout': layout}), 200
             
@@ -115,6 +119,10 @@ def create_layout():
             
             layout = dict(layout_result)
             layout['created_at'] = layout['created_at'].isoformat() if layout['created_at'] else None
+            layout['updated_at'] = layout['updated_at'].isoformat() if layout['updated_at'] else None
+            
+            db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
             
             return jsonify({'layout': layout}), 201
             
@@ -163,7 +171,7 @@ def update_layout(layout_id):
             db.execute(
                 text(f'''
                     UPDATE offer_layouts 
-                    SET {', '.join(update_fields)}
+                    SET {', '.join(update_fields)}, updated_at = now()
                     WHERE id = :layout_id AND shop_id = :shop_id
                 '''),
                 params
@@ -177,6 +185,10 @@ def update_layout(layout_id):
             
             layout = dict(result)
             layout['created_at'] = layout['created_at'].isoformat() if layout['created_at'] else None
+            layout['updated_at'] = layout['updated_at'].isoformat() if layout['updated_at'] else None
+            
+            db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
             
             return jsonify({'layout': layout}), 200
             
@@ -217,6 +229,9 @@ def delete_layout(layout_id):
             if delete_result.rowcount == 0:
                 return jsonify({'error': 'Layout not found'}), 404
             
+            db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
+            
             return jsonify({'message': 'Layout deleted successfully'}), 200
             
     except Exception as e:
@@ -243,14 +258,9 @@ def preview_layout():
             'image_url': data.get('image_url', 'https://via.placeholder.com/300x200?text=Warranty')
         }
         
-        # Generate preview HTML based on layout
-        layout_html = data.get('preview_html', '')
-        
-        # Replace placeholders with sample data
-        preview_html = layout_html.replace('{{headline}}', sample_data['headline'])
-        preview_html = preview_html.replace('{{body}}', sample_data['body'])
-        preview_html = preview_html.replace('{{button_text}}', sample_data['button_text'])
-        preview_html = preview_html.replace('{{image_url}}', sample_data['image_url'])
+        # Fill the layout's placeholders with the sample data; the compiled
+        # template is reused while the editor re-previews the same HTML
+        preview_html = layout_renderer.render(data.get('preview_html', ''), sample_data)
         
         return jsonify({
             'preview_html': preview_html,
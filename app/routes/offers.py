@@ -1,9 +1,19 @@
 from flask import Blueprint, request, jsonify
-from sqlalchemy import text
+from sqlalchemy import text, bindparam, DateTime
+import base64
+import hashlib
 import json
-from datetime import datetime
-from ..utils.auth import require_auth, get_shop_context
-from ..models.database import get_db, Offer, OfferTheme, OfferLayout, Shop, WarrantyInsuranceProduct, WarrantyPricingBand
+from collections import namedtuple
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from ..utils.auth import require_auth, get_shop_context, resolve_shop
+from ..utils.request_profiler import profile_span
+from ..models.database import get_db, release_request_db, offer_theme_id, Offer, OfferTheme, OfferLayout, Shop
+from ..config import Config
+from ..services.band_index import band_index, band_history_index
+from ..services.category_classifier import category_classifier
+from ..services.quote_cache import quote_cache
+from ..services.offer_bundle_cache import offer_bundle_cache
 import logging
 import requests
 
@@ -13,43 +23,125 @@ logger = logging.getLogger(__name__)
 offers_bp = Blueprint('offers', __name__)
 
 
+# Columns GET /api/offers can return, by field name
+OFFER_LIST_COLUMNS = {
+    'id': 'o.id',
+    'headline': 'o.headline',
+    'body': 'o.body',
+    'image_url': 'o.image_url',
+    'button_text': 'o.button_text',
+    'button_url': 'o.button_url',
+    'theme': 'o.theme',
+    'theme_id': 'o.theme_id',
+    'layout_id': 'o.layout_id',
+    'layout_name': 'ol.name',
+    'status': 'o.status',
+    'created_at': 'o.created_at',
+    'updated_at': 'o.updated_at'
+}
+
+
+def encode_offers_cursor(created_at, offer_id):
+    """Opaque cursor for the page after the offer (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{offer_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_offers_cursor(cursor):
+    """Return (created_at, id) from a cursor, or None if it is malformed"""
+    try:
+        created_at, offer_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(offer_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def parse_offer_fields(fields_param):
+    """Return the requested field names, or None if one is unknown.
+
+    id and created_at are always returned; the cursor is built from them.
+    """
+    if not fields_param:
+        return list(OFFER_LIST_COLUMNS)
+
+    fields = ['id', 'created_at']
+    for field in fields_param.split(','):
+        field = field.strip()
+        if field not in OFFER_LIST_COLUMNS:
+            return None
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+
 @offers_bp.route('/offers', methods=['GET'])
 @require_auth
 def get_offers():
-    """Get all offers for a shop"""
+    """Get a shop's offers, newest first.
+
+    Without ?limit= or ?cursor= every offer is returned, as before pagination
+    existed. ?limit= asks for a page (OFFERS_PAGE_SIZE when only ?cursor= is
+    given, at most OFFERS_PAGE_MAX), ?cursor= continues from a previous
+    page's next_cursor and ?fields= picks the fields returned, e.g.
+    fields=headline,status for a list view.
+    """
     try:
         shop_context = get_shop_context()
-        
-        with get_db() as db:
-            result = db.execute(
-                text('''
-                    SELECT o.*, ol.name as layout_name
-                    FROM offers o
-                    LEFT JOIN offer_layouts ol ON o.layout_id = ol.id
-                    WHERE o.shop_id = :shop_id
-                    ORDER BY o.created_at DESC
-                '''),
-                {'shop_id': shop_context['shop_id']}
-            ).mappings().all()
-
-            offers = []
-            for row in result:
-                offers.append({
-                    'id': row['id'],
-                    'headline': row['headline'],
-                    'body': row['body'],
-                    'image_url': row['image_url'],
-                    'button_text': row['button_text'],
-                    'button_url': row['button_url'],
-                    'theme': row['theme'],
-                    'layout_id': row['layout_id'],
-                    'layout_name': row['layout_name'],
-                    'status': row['status'],
-                    'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                    'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-                })
-
-            return jsonify({'offers': offers}), 200
+
+        fields = parse_offer_fields(request.args.get('fields'))
+        if fields is None:
+            return jsonify({'error': f"fields must be a comma-separated list of: {', '.join(OFFER_LIST_COLUMNS)}"}), 400
+
+        cursor = request.args.get('cursor')
+        paginated = 'limit' in request.args or bool(cursor)
+        limit = None
+        if paginated:
+            limit = request.args.get('limit', Config.OFFERS_PAGE_SIZE, type=int)
+            limit = max(1, min(limit, Config.OFFERS_PAGE_MAX))
+
+        params = {'shop_id': shop_context['shop_id'], 'limit': limit + 1 if paginated else None}
+        keyset = ''
+        if cursor:
+            position = decode_offers_cursor(cursor)
+            if position is None:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            params['cursor_created_at'], params['cursor_id'] = position
+            # Served by idx_offers_shop_created_id on (shop_id, created_at DESC, id DESC)
+            keyset = 'AND (o.created_at, o.id) < (:cursor_created_at, :cursor_id)'
+
+        columns = ', '.join(f"{OFFER_LIST_COLUMNS[field]} AS {field}" for field in fields)
+        join = 'LEFT JOIN offer_layouts ol ON o.layout_id = ol.id' if 'layout_name' in fields else ''
+        datetime_columns = {field: DateTime() for field in ('created_at', 'updated_at') if field in fields}
+
+        query = text(f'''
+            SELECT {columns}
+            FROM offers o
+            {join}
+            WHERE o.shop_id = :shop_id {keyset}
+            ORDER BY o.created_at DESC, o.id DESC
+            {'LIMIT :limit' if paginated else ''}
+        ''')
+        if keyset:
+            query = query.bindparams(bindparam('cursor_created_at', type_=DateTime()))
+
+        with get_db(readonly=True) as db:
+            rows = db.execute(query.columns(**datetime_columns), params).mappings().all()
+
+        # One row past the page tells whether there is a next one
+        next_cursor = None
+        if paginated and len(rows) > limit:
+            rows = rows[:limit]
+            # created_at is NOT NULL (add_offers_keyset_index.sql), so every row can anchor a cursor
+            next_cursor = encode_offers_cursor(rows[-1]['created_at'], rows[-1]['id'])
+
+        offers = []
+        for row in rows:
+            offer = dict(row)
+            for field in datetime_columns:
+                offer[field] = offer[field].isoformat() if offer[field] else None
+            offers.append(offer)
+
+        return jsonify({'offers': offers, 'next_cursor': next_cursor}), 200
 
     except Exception as e:
         logger.error(f"Get offers error: {str(e)}")
@@ -63,7 +155,7 @@ def get_offer(offer_id):
     try:
         shop_context = get_shop_context()
         
-        with get_db() as db:
+        with get_db(readonly=True, replica=False) as db:
             result = db.execute(
                 text('''
                     SELECT o.*, ol.name as layout_name
@@ -85,6 +177,7 @@ def get_offer(offer_id):
                 'button_text': result['button_text'],
                 'button_url': result['button_url'],
                 'theme': result['theme'],
+                'theme_id': result['theme_id'],
                 'layout_id': result['layout_id'],
                 'layout_name': result['layout_name'],
                 'status': result['status'],
@@ -121,12 +214,14 @@ def create_offer():
                 button_text=data['button_text'],
                 button_url=data.get('button_url'),
                 theme=data.get('theme'),
+                theme_id=offer_theme_id(data.get('theme')),
                 layout_id=data.get('layout_id'),
                 status=data.get('status', 'active')
             )
             db.add(new_offer)
             db.commit()
             db.refresh(new_offer)
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
 
             return jsonify({
                 'message': 'Offer created successfully',
@@ -168,12 +263,14 @@ def update_offer(offer_id):
                 offer.button_url = data['button_url']
             if 'theme' in data:
                 offer.theme = data['theme']
+                offer.theme_id = offer_theme_id(data['theme'])
             if 'layout_id' in data:
                 offer.layout_id = data['layout_id']
             if 'status' in data:
                 offer.status = data['status']
 
             db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
 
             return jsonify({'message': 'Offer updated successfully'}), 200
 
@@ -200,6 +297,7 @@ def delete_offer(offer_id):
 
             db.delete(offer)
             db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
 
             return jsonify({'message': 'Offer deleted successfully'}), 200
 
@@ -227,6 +325,7 @@ def toggle_offer_status(offer_id):
             # Toggle status
             offer.status = 'inactive' if offer.status == 'active' else 'active'
             db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
 
             return jsonify({
                 'message': 'Offer status updated successfully',
@@ -238,124 +337,775 @@ def toggle_offer_status(offer_id):
         return jsonify({'error': 'Failed to toggle status'}), 500
 
 
-@offers_bp.route('/pricing', methods=['POST'])
+@offers_bp.route('/offers/bulk', methods=['POST'])
+@require_auth
+def bulk_offers():
+    """Create, update, delete and change the status of many offers in one transaction.
+
+    Body: {"operations": [{"action": "create", "offer": {...}},
+                          {"action": "update", "id": 1, "offer": {...}},
+                          {"action": "delete", "id": 2},
+                          {"action": "set_status", "id": 3, "status": "inactive"},
+                          {"action": "toggle_status", "id": 4}]}
+
+    Each action runs as one set-based statement for all of its operations.
+    Results are reported per operation in request order; an invalid operation
+    or an unknown offer fails on its own and the rest are still applied.
+    """
+    try:
+        shop_context = get_shop_context()
+
+        operations, results, failure = parse_bulk_offer_operations(request.get_json(silent=True))
+        if failure:
+            message, status = failure
+            return jsonify({'error': message}), status
+
+        if operations:
+            with get_db() as db:
+                apply_bulk_offer_operations(db, shop_context['shop_id'], operations, results)
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
+
+        succeeded = sum(1 for result in results if result['success'])
+        return jsonify({
+            'results': results,
+            'summary': {'succeeded': succeeded, 'failed': len(results) - succeeded}
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Bulk offers error: {str(e)}")
+        return jsonify({'error': 'Failed to apply offer changes'}), 500
+
+
+OFFER_STATUSES = ('active', 'inactive', 'draft')
+
+# Offer fields a bulk create or update can set, with their SQL types for the
+# VALUES list of the set-based update
+OFFER_FIELD_TYPES = {
+    'headline': 'TEXT',
+    'body': 'TEXT',
+    'image_url': 'TEXT',
+    'button_text': 'VARCHAR(255)',
+    'button_url': 'TEXT',
+    'theme': 'JSONB',
+    'layout_id': 'INTEGER',
+    'status': 'VARCHAR(50)'
+}
+
+# Columns a bulk write sets: the fields above plus theme_id, derived from theme
+OFFER_COLUMN_TYPES = {**OFFER_FIELD_TYPES, 'theme_id': 'INTEGER'}
+
+# Largest value of an INTEGER column (offer and layout ids)
+MAX_INTEGER_ID = 2 ** 31 - 1
+
+# Expands to one placeholder per id; unlike ANY(:ids) it also runs on SQLite
+IDS_PARAM = bindparam('ids', expanding=True)
+
+BulkOfferOperation = namedtuple('BulkOfferOperation', ['index', 'action', 'offer_id', 'fields'])
+
+
+def parse_bulk_offer_operations(data):
+    """Validate a bulk offers request.
+
+    Returns (operations, results, None), where results is aligned with the
+    request and already holds the failures of invalid operations, or
+    (None, None, (error message, HTTP status)) when the request itself is invalid.
+    """
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return None, None, ('Missing operations', 400)
+    if len(operations) > Config.OFFERS_BULK_MAX_OPERATIONS:
+        return None, None, (f'Too many operations (max {Config.OFFERS_BULK_MAX_OPERATIONS})', 400)
+
+    valid = []
+    results = [None] * len(operations)
+    seen_ids = set()
+    for index, item in enumerate(operations):
+        item = item if isinstance(item, dict) else {}
+        operation, error = _parse_bulk_offer_operation(index, item)
+        if not error and operation.offer_id is not None:
+            # Set-based statements can't order two changes to one offer
+            if operation.offer_id in seen_ids:
+                error = 'Offer appears in more than one operation'
+            seen_ids.add(operation.offer_id)
+
+        if error:
+            results[index] = _bulk_offer_result(index, item.get('action'), item.get('id'), error=error)
+        else:
+            valid.append(operation)
+
+    return valid, results, None
+
+
+def _parse_bulk_offer_operation(index, item):
+    action = item.get('action')
+    offer_id = item.get('id')
+    offer = item.get('offer') if isinstance(item.get('offer'), dict) else {}
+
+    if action == 'create':
+        for field in ('headline', 'body', 'button_text'):
+            if not offer.get(field):
+                return None, f'Missing required field: {field}'
+        fields = {field: offer.get(field) for field in OFFER_FIELD_TYPES}
+        fields['status'] = fields['status'] or 'active'
+        offer_id = None
+    elif action not in ('update', 'delete', 'set_status', 'toggle_status'):
+        return None, 'Invalid action'
+    elif not _is_integer_id(offer_id):
+        return None, 'Missing or invalid id'
+    elif action == 'update':
+        fields = {field: value for field, value in offer.items() if field in OFFER_FIELD_TYPES}
+        if not fields:
+            return None, 'No fields to update'
+    elif action == 'set_status':
+        fields = {'status': item.get('status')}
+    else:
+        fields = {}
+
+    if 'status' in fields and fields['status'] not in OFFER_STATUSES:
+        return None, f"status must be one of: {', '.join(OFFER_STATUSES)}"
+    for field, value in fields.items():
+        error = _bulk_offer_field_error(field, value)
+        if error:
+            return None, error
+    if 'theme' in fields:
+        fields['theme_id'] = offer_theme_id(fields['theme'])
+
+    return BulkOfferOperation(index, action, offer_id, fields), None
+
+
+def _bulk_offer_field_error(field, value):
+    """Why value can't be written to an offer's field, or None; caught here so
+    one bad value fails its own operation instead of the whole statement"""
+    if value is None or field == 'status':
+        return None
+    if field == 'layout_id':
+        return None if _is_integer_id(value) else 'layout_id must be a positive integer'
+    if field == 'theme':
+        return None if isinstance(value, dict) else 'theme must be an object'
+    if not isinstance(value, str):
+        return f'{field} must be a string'
+    if '\x00' in value:
+        return f'{field} must not contain NUL characters'
+    if field == 'button_text' and len(value) > 255:
+        return 'button_text must be at most 255 characters'
+    return None
+
+
+def _is_integer_id(value):
+    return isinstance(value, int) and not isinstance(value, bool) and 0 < value <= MAX_INTEGER_ID
+
+
+def _bulk_offer_result(index, action, offer_id, error=None, **fields):
+    result = {'index': index, 'action': action, 'id': offer_id, 'success': error is None, **fields}
+    if error:
+        result['error'] = error
+    return result
+
+
+def apply_bulk_offer_operations(db, shop_id, operations, results):
+    """Apply validated bulk operations with one statement per action (and per
+    status or set of updated fields), filling in results.
+
+    Deletes and updates return the ids they touched; an operation whose offer
+    was not returned doesn't exist or belongs to another shop. Operations
+    setting a layout_id the shop doesn't own fail before anything is written.
+    """
+    layout_ids = {operation.fields['layout_id'] for operation in operations
+                  if operation.fields.get('layout_id') is not None}
+    if layout_ids:
+        owned = set(db.execute(
+            text('SELECT id FROM offer_layouts WHERE shop_id = :shop_id AND id IN :ids').bindparams(IDS_PARAM),
+            {'shop_id': shop_id, 'ids': sorted(layout_ids)}
+        ).scalars().all())
+        valid = []
+        for operation in operations:
+            layout_id = operation.fields.get('layout_id')
+            if layout_id is not None and layout_id not in owned:
+                results[operation.index] = _bulk_offer_result(operation.index, operation.action, operation.offer_id,
+                                                              error='Layout not found')
+            else:
+                valid.append(operation)
+        operations = valid
+
+    by_action = {}
+    for operation in operations:
+        by_action.setdefault(operation.action, []).append(operation)
+
+    def record(batch, touched, **fields):
+        for operation in batch:
+            if operation.offer_id in touched:
+                results[operation.index] = _bulk_offer_result(operation.index, operation.action, operation.offer_id,
+                                                              **touched[operation.offer_id], **fields)
+            else:
+                results[operation.index] = _bulk_offer_result(operation.index, operation.action, operation.offer_id,
+                                                              error='Offer not found')
+
+    batch = by_action.get('delete', [])
+    if batch:
+        deleted = db.execute(
+            text('DELETE FROM offers WHERE shop_id = :shop_id AND id IN :ids RETURNING id').bindparams(IDS_PARAM),
+            {'shop_id': shop_id, 'ids': [operation.offer_id for operation in batch]}
+        ).scalars().all()
+        record(batch, {offer_id: {} for offer_id in deleted})
+
+    by_status = {}
+    for operation in by_action.get('set_status', []):
+        by_status.setdefault(operation.fields['status'], []).append(operation)
+    for status, batch in by_status.items():
+        updated = db.execute(
+            text('''
+                UPDATE offers SET status = :status, updated_at = now()
+                WHERE shop_id = :shop_id AND id IN :ids
+                RETURNING id
+            ''').bindparams(IDS_PARAM),
+            {'status': status, 'shop_id': shop_id, 'ids': [operation.offer_id for operation in batch]}
+        ).scalars().all()
+        record(batch, {offer_id: {'status': status} for offer_id in updated})
+
+    batch = by_action.get('toggle_status', [])
+    if batch:
+        toggled = db.execute(
+            text('''
+                UPDATE offers
+                SET status = CASE WHEN status = 'active' THEN 'inactive' ELSE 'active' END, updated_at = now()
+                WHERE shop_id = :shop_id AND id IN :ids
+                RETURNING id, status
+            ''').bindparams(IDS_PARAM),
+            {'shop_id': shop_id, 'ids': [operation.offer_id for operation in batch]}
+        ).all()
+        record(batch, {offer_id: {'status': status} for offer_id, status in toggled})
+
+    by_fields = {}
+    for operation in by_action.get('update', []):
+        by_fields.setdefault(tuple(sorted(operation.fields)), []).append(operation)
+    for fields, batch in by_fields.items():
+        record(batch, {offer_id: {} for offer_id in _bulk_update_offers(db, shop_id, fields, batch)})
+
+    batch = by_action.get('create', [])
+    if batch:
+        # insertmanyvalues: multi-row INSERTs whose RETURNING rows come back in parameter order
+        created = db.execute(
+            Offer.__table__.insert().returning(Offer.__table__.c.id, sort_by_parameter_order=True),
+            [{'shop_id': shop_id, **operation.fields} for operation in batch]
+        ).scalars().all()
+        for operation, offer_id in zip(batch, created):
+            results[operation.index] = _bulk_offer_result(operation.index, operation.action, offer_id)
+
+
+def _bulk_update_offers(db, shop_id, fields, batch):
+    """UPDATE ... FROM (VALUES ...) setting the same fields on every offer in batch; returns the ids updated"""
+    rows = []
+    params = {'shop_id': shop_id}
+    for position, operation in enumerate(batch):
+        values = [f'CAST(:id_{position} AS INTEGER)']
+        params[f'id_{position}'] = operation.offer_id
+        for field in fields:
+            value = operation.fields[field]
+            if field == 'theme' and value is not None:
+                value = json.dumps(value)
+            values.append(f'CAST(:{field}_{position} AS {OFFER_COLUMN_TYPES[field]})')
+            params[f'{field}_{position}'] = value
+        rows.append(f"({', '.join(values)})")
+
+    return db.execute(
+        text(f'''
+            UPDATE offers AS o
+            SET {', '.join(f'{field} = v.{field}' for field in fields)}, updated_at = now()
+            FROM (VALUES {', '.join(rows)}) AS v(id, {', '.join(fields)})
+            WHERE o.id = v.id AND o.shop_id = :shop_id
+            RETURNING o.id
+        '''),
+        params
+    ).scalars().all()
+
+
+@offers_bp.route('/pricing', methods=['GET', 'POST'])
 def get_dynamic_pricing():
-    """Get dynamic pricing for warranty product based on AIG pricing bands"""
+    """Get dynamic pricing for warranty product based on AIG pricing bands.
+
+    GET takes the same fields as query parameters and answers If-None-Match
+    with a 304. Quotes are cached per resolved pricing band, so a cached repeat
+    request from a cached shop does not touch the database. An optional ISO 8601 as_of prices the
+    product with the bands that were effective at that time. With
+    quote_mode=all_insurers the response lists options from every active
+    insurer for the category plus the cheapest option per term.
+    """
     try:
         # Check for API key authentication
         api_key = request.headers.get('X-API-Key')
         if not api_key:
             return jsonify({'error': 'Missing API key'}), 401
         
-        # Be tolerant of clients missing the JSON content-type
-        try:
-            data = request.get_json(silent=True)
-            if data is None and request.data:
-                import json as _json
-                data = _json.loads(request.data)
-        except Exception:
-            data = {}
-        
-        session_token = data.get('session_token')
-        product_id = data.get('product_id')
-        product_price = data.get('product_price', 0)
-        product_category = data.get('product_category', 'Consumer Electronics')  # Default category
+        if request.method == 'GET':
+            data = request.args
+        else:
+            # Be tolerant of clients missing the JSON content-type
+            try:
+                data = request.get_json(silent=True)
+                if data is None and request.data:
+                    import json as _json
+                    data = _json.loads(request.data)
+            except Exception:
+                data = {}
+
+        pricing_request, failure = parse_pricing_request(data)
+        if failure:
+            message, status = failure
+            return jsonify({'error': message}), status
         shop_domain = request.headers.get('X-Shop-Domain')
-        
-        if not session_token or not product_id:
-            return jsonify({'error': 'Missing session_token or product_id'}), 400
 
-        # Get shop info and validate API key
-        with get_db() as db:
-            shop = db.query(Shop).filter_by(shop_url=shop_domain).first()
-            if not shop:
-                return jsonify({'error': 'Shop not found'}), 404
-            
-            # Validate API key against shop record
-            if not shop.api_key or shop.api_key != api_key:
-                return jsonify({'error': 'Invalid API key'}), 401
+        # Validate the API key before any quote is served, cached or not; a warm
+        # shop is checked in memory
+        shop, error = _get_pricing_shop(shop_domain, api_key)
+        if error:
+            return error
 
-        # Get all warranty pricing options from AIG pricing bands
-        pricing_options = get_all_warranty_pricing_options(product_price, product_category)
-        
-        if not pricing_options:
+        lookup = lookup_pricing_quote(pricing_request, shop_domain, api_key)
+        quote = lookup.quote or build_pricing_quote(pricing_request, lookup, shop)
+        if quote is None:
             return jsonify({'error': 'No pricing found for this product'}), 404
 
-        return jsonify({
-            'session_token': session_token,
+        response = jsonify(pricing_response_body(pricing_request, quote))
+        response.set_etag(pricing_response_etag(pricing_request, quote))
+        response.headers['Cache-Control'] = f'private, max-age={Config.PRICING_QUOTE_MAX_AGE}'
+        response.vary.update(('X-Shop-Domain', 'X-API-Key'))
+        return response.make_conditional(request)
+
+    except Exception as e:
+        logger.error(f"Dynamic pricing error: {str(e)}")
+        return jsonify({'error': 'Failed to get pricing'}), 500
+
+
+@offers_bp.route('/offer-bundle', methods=['GET'])
+def get_offer_bundle():
+    """Get everything the storefront embed needs in one call.
+
+    Returns the shop's active offer with its theme and layout, the checkout
+    settings and, when the pricing query parameters of GET /api/pricing are
+    given, the quote. The offer part comes from a per-shop snapshot that
+    writes to offers, themes, layouts and settings invalidate.
+    """
+    try:
+        api_key = request.headers.get('X-API-Key')
+        if not api_key:
+            return jsonify({'error': 'Missing API key'}), 401
+        shop_domain = request.headers.get('X-Shop-Domain')
+
+        shop, error = _get_pricing_shop(shop_domain, api_key)
+        if error:
+            return error
+
+        bundle = offer_bundle_cache.get(shop.id) or offer_bundle_cache.load(shop.id)
+        body, etag = offer_bundle_response_body(bundle, request.args, shop_domain, api_key, shop)
+
+        response = jsonify(body)
+        response.set_etag(etag)
+        # Revalidate every time, so an invalidated snapshot is never served from the browser cache
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.update(('X-Shop-Domain', 'X-API-Key'))
+        return response.make_conditional(request)
+
+    except Exception as e:
+        logger.error(f"Offer bundle error: {str(e)}")
+        return jsonify({'error': 'Failed to get offer bundle'}), 500
+
+
+@offers_bp.route('/pricing/categories', methods=['GET'])
+def get_pricing_categories():
+    """Get the versioned product category keyword table used by the embed"""
+    table = category_classifier.to_dict()
+    response = jsonify(table)
+    response.set_etag(f"categories-v{table['version']}")
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response.make_conditional(request)
+
+
+@offers_bp.route('/pricing/batch', methods=['POST'])
+def get_batch_pricing():
+    """Get warranty pricing for many products (collection and search pages) in one call"""
+    try:
+        api_key = request.headers.get('X-API-Key')
+        if not api_key:
+            return jsonify({'error': 'Missing API key'}), 401
+
+        batch_request, failure = parse_batch_pricing_request(request.get_json(silent=True))
+        if failure:
+            message, status = failure
+            return jsonify({'error': message}), status
+
+        shop, error = _get_pricing_shop(request.headers.get('X-Shop-Domain'), api_key)
+        if error:
+            return error
+
+        return jsonify(batch_pricing_response_body(batch_request, shop)), 200
+
+    except Exception as e:
+        logger.error(f"Batch pricing error: {str(e)}")
+        return jsonify({'error': 'Failed to get pricing'}), 500
+
+
+# The pricing helpers below are shared by the Flask routes above and the async
+# storefront app (app/asgi.py); they never touch the database. Failures are
+# returned as (error message, HTTP status) so each app renders its own response.
+
+PricingRequest = namedtuple('PricingRequest', [
+    'session_token', 'product_id', 'product_price', 'product_category', 'as_of', 'quote_mode'
+])
+
+PricingLookup = namedtuple('PricingLookup', [
+    'matches', 'insurance_product', 'pricing_band', 'band_key', 'cache_key', 'quote'
+])
+
+BatchPricingRequest = namedtuple('BatchPricingRequest', ['session_token', 'items', 'as_of'])
+
+
+def parse_pricing_request(data):
+    """Validate the fields of a pricing request: (PricingRequest, None) or (None, failure)"""
+    data = data or {}
+    if not isinstance(data, Mapping):
+        return None, ('Request body must be a JSON object', 400)
+    session_token = data.get('session_token')
+    product_id = data.get('product_id')
+    product_category = data.get('product_category')
+    if not product_category:
+        # Classify from the title when the client sends one, else use the default category
+        product_category = category_classifier.product_category_for_title(data.get('product_title'))
+
+    if not session_token or not product_id:
+        return None, ('Missing session_token or product_id', 400)
+
+    try:
+        as_of = _parse_as_of(data.get('as_of'))
+    except ValueError:
+        return None, ('Invalid as_of timestamp', 400)
+
+    quote_mode = data.get('quote_mode') or 'single'
+    if quote_mode not in ('single', 'all_insurers'):
+        return None, ('Invalid quote_mode', 400)
+    if quote_mode == 'all_insurers' and as_of:
+        return None, ('as_of is not supported with quote_mode=all_insurers', 400)
+
+    return PricingRequest(session_token, product_id, data.get('product_price', 0),
+                          product_category, as_of, quote_mode), None
+
+
+def lookup_pricing_quote(pricing_request, shop_domain, api_key):
+    """Resolve the pricing bands and look the quote up in the quote cache.
+
+    The quote only depends on the bands, not the raw price, so bands are
+    resolved first. quote is None on a cache miss. Callers must have checked
+    the API key (_get_pricing_shop) before serving it.
+    """
+    matches, insurance_product, pricing_band = [], None, None
+    if pricing_request.quote_mode == 'all_insurers':
+        matches = _resolve_all_insurer_bands(pricing_request.product_price, pricing_request.product_category)
+        band_key = tuple(pricing_band.id for _, pricing_band in matches) or None
+    else:
+        insurance_product, pricing_band = _resolve_pricing_band(
+            pricing_request.product_price, pricing_request.product_category, pricing_request.as_of
+        )
+        band_key = pricing_band.id if pricing_band else None
+
+    cache_key = None
+    quote = None
+    if band_key:
+        band_version = band_history_index.version if pricing_request.as_of else band_index.version
+        cache_key = quote_cache.key(band_version, shop_domain, api_key, pricing_request.product_category, band_key)
+        quote = quote_cache.get(cache_key)
+
+    return PricingLookup(matches, insurance_product, pricing_band, band_key, cache_key, quote)
+
+
+def build_pricing_quote(pricing_request, lookup, shop):
+    """Build and cache the quote for a cache miss; None when no band matched"""
+    if not lookup.band_key:
+        return None
+
+    if pricing_request.quote_mode == 'all_insurers':
+        payload = {
+            'variant_id': shop.variant_id,
+            **_build_all_insurer_options(lookup.matches, pricing_request.product_category)
+        }
+    else:
+        pricing_options = _build_pricing_options(lookup.insurance_product, lookup.pricing_band,
+                                                 pricing_request.product_category)
+        payload = {
             'variant_id': shop.variant_id,
-            'product_category': product_category,
+            'product_category': pricing_request.product_category,
             'includes_adh': pricing_options['includes_adh'],
             'pricing_options': pricing_options['options']
-        }), 200
+        }
+    return quote_cache.put(lookup.cache_key, shop.variant_id, payload)
+
+
+def pricing_response_body(pricing_request, quote):
+    body = {'session_token': pricing_request.session_token, **quote.payload}
+    if pricing_request.as_of:
+        body['as_of'] = pricing_request.as_of.isoformat()
+    return body
+
+
+def pricing_response_etag(pricing_request, quote):
+    """ETag of pricing_response_body: the cached quote's ETag covers the shared
+    payload, so the per-request session_token and as_of are mixed in here"""
+    as_of = pricing_request.as_of.isoformat() if pricing_request.as_of else ''
+    return hashlib.sha1(
+        f'{quote.etag}\0{pricing_request.session_token}\0{as_of}'.encode('utf-8')
+    ).hexdigest()[:20]
+
+
+def parse_batch_pricing_request(data):
+    """Validate a batch pricing request: (BatchPricingRequest, None) or (None, failure)"""
+    data = data or {}
+    if not isinstance(data, Mapping):
+        return None, ('Request body must be a JSON object', 400)
+    session_token = data.get('session_token')
+    items = data.get('items')
+
+    if not session_token or not isinstance(items, list) or not items:
+        return None, ('Missing session_token or items', 400)
+
+    if len(items) > Config.PRICING_BATCH_MAX_ITEMS:
+        return None, (f'Too many items (max {Config.PRICING_BATCH_MAX_ITEMS})', 400)
+
+    try:
+        as_of = _parse_as_of(data.get('as_of'))
+    except ValueError:
+        return None, ('Invalid as_of timestamp', 400)
+
+    requested = []
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        requested.append({
+            'product_id': item.get('product_id'),
+            'product_price': item.get('product_price', 0),
+            'product_category': (item.get('product_category')
+                                 or category_classifier.product_category_for_title(item.get('product_title')))
+        })
+
+    return BatchPricingRequest(session_token, requested, as_of), None
+
+
+def batch_pricing_response_body(batch_request, shop):
+    results = []
+    for item, pricing_options in zip(batch_request.items,
+                                     get_many_warranty_pricing_options(batch_request.items, batch_request.as_of)):
+        if pricing_options:
+            results.append({'product_id': item['product_id'], **pricing_options})
+        else:
+            results.append({
+                'product_id': item['product_id'],
+                'product_category': item['product_category'],
+                'error': 'No pricing found for this product'
+            })
+
+    response = {
+        'session_token': batch_request.session_token,
+        'variant_id': shop.variant_id,
+        'items': results
+    }
+    if batch_request.as_of:
+        response['as_of'] = batch_request.as_of.isoformat()
+    return response
+
+
+def offer_bundle_response_body(bundle, data, shop_domain, api_key, shop):
+    """Offer bundle response body and ETag.
+
+    A product_id in data adds the quote for it under pricing; a pricing
+    failure is reported there rather than failing the bundle.
+    """
+    if not data.get('product_id'):
+        return {**bundle.payload, 'pricing': None}, bundle.etag
+
+    pricing_request, failure = parse_pricing_request(data)
+    quote = None
+    if not failure:
+        lookup = lookup_pricing_quote(pricing_request, shop_domain, api_key)
+        quote = lookup.quote or build_pricing_quote(pricing_request, lookup, shop)
+        if quote is None:
+            failure = ('No pricing found for this product', 404)
+
+    if failure:
+        message, _ = failure
+        error_etag = hashlib.sha1(message.encode('utf-8')).hexdigest()[:8]
+        return {**bundle.payload, 'pricing': {'error': message}}, f'{bundle.etag}-e{error_etag}'
+    return ({**bundle.payload, 'pricing': pricing_response_body(pricing_request, quote)},
+            f'{bundle.etag}-{pricing_response_etag(pricing_request, quote)}')
+
+
+def _get_pricing_shop(shop_domain, api_key):
+    """Load the shop for a pricing request and validate its API key.
+
+    Shares require_auth's per-worker shop cache, so a warm shop costs no query
+    and a cold one a single statement for id, variant_id and API key.
+    """
+    return resolve_shop(shop_domain, (api_key or '').strip())
+
+
+def _parse_as_of(value):
+    """Parse an ISO 8601 as_of timestamp into naive UTC, matching the band timestamps"""
+    if value in (None, ''):
+        return None
+    as_of = datetime.fromisoformat(str(value))
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    return as_of
+
+
+def get_all_warranty_pricing_options(product_price, product_category, as_of=None):
+    """Get all warranty pricing options from AIG pricing bands, optionally as of a past time"""
+    insurance_product, pricing_band = _resolve_pricing_band(product_price, product_category, as_of)
+    if not pricing_band:
+        return None
+
+    return _build_pricing_options(insurance_product, pricing_band, product_category)
+
+
+def _resolve_pricing_band(product_price, product_category, as_of=None):
+    """Resolve the AIG insurance product and pricing band for a price, now or as of a past time"""
+    try:
+        # Resolved from the in-memory band indexes, no database round trip
+        if as_of:
+            insurance_product, pricing_band = band_history_index.lookup_as_of(
+                product_category, product_price, as_of, insurer_name='AIG'
+            )
+        else:
+            insurance_product, pricing_band = band_index.lookup(product_category, product_price, insurer_name='AIG')
+
+        if not insurance_product:
+            logger.error(f"No active AIG insurance product found for category: {product_category}")
+            return None, None
+
+        if not pricing_band:
+            logger.error(f"No pricing band found for product price: {product_price}")
+            return insurance_product, None
+
+        return insurance_product, pricing_band
 
     except Exception as e:
-        logger.error(f"Dynamic pricing error: {str(e)}")
-        return jsonify({'error': 'Failed to get pricing'}), 500
+        logger.error(f"Error getting warranty pricing options: {str(e)}")
+        return None, None
 
 
-def get_all_warranty_pricing_options(product_price, product_category):
-    """Get all warranty pricing options from AIG pricing bands"""
+def _resolve_all_insurer_bands(product_price, product_category):
+    """Resolve the pricing band of every active insurer for a price in one merged-index lookup"""
     try:
-        with get_db() as db:
-            # Get active insurance product for the category
-            insurance_product = db.query(WarrantyInsuranceProduct).filter_by(
-                insurer_name='AIG',
-                product_category=product_category,
-                is_active=True
-            ).first()
-            
-            if not insurance_product:
-                logger.error(f"No active AIG insurance product found for category: {product_category}")
-                return None
-            
-            # Get pricing band for the product price
-            pricing_band = db.query(WarrantyPricingBand).filter(
-                WarrantyPricingBand.insurance_product_id == insurance_product.id,
-                WarrantyPricingBand.msrp_min <= product_price,
-                WarrantyPricingBand.msrp_max >= product_price,
-                WarrantyPricingBand.expiry_date.is_(None)  # Currently active
-            ).first()
-            
-            if not pricing_band:
-                logger.error(f"No pricing band found for product price: {product_price}")
-                return None
-            
-            # Return all available pricing options
-            options = []
-            
-            # Add 2-year option
-            if pricing_band.price_2_year:
-                options.append({
-                    'term': 2,
-                    'price': float(pricing_band.price_2_year),
-                    'display_name': '2 Year'
-                })
-            
-            # Add 3-year option
-            if pricing_band.price_3_year:
-                options.append({
-                    'term': 3,
-                    'price': float(pricing_band.price_3_year),
-                    'display_name': '3 Year'
-                })
-            
-            # Note: AIG pricing typically only has 2-year and 3-year options
-            # If you need 1-year options, you'd need to add that to the pricing bands
-            
-            return {
-                'options': options,
-                'includes_adh': insurance_product.includes_adh,
-                'product_category': product_category
-            }
-            
+        matches = band_index.lookup_all(product_category, product_price)
+        if not matches:
+            logger.error(f"No pricing band from any insurer for {product_category} at price: {product_price}")
+        return matches
+
     except Exception as e:
         logger.error(f"Error getting warranty pricing options: {str(e)}")
-        return None
+        return []
+
+
+def _build_all_insurer_options(matches, product_category):
+    """Build per-insurer pricing options and the cheapest option per term"""
+    quotes = []
+    cheapest = {}
+    for insurance_product, pricing_band in matches:
+        pricing_options = _build_pricing_options(insurance_product, pricing_band, product_category)
+        quotes.append({
+            'insurer_name': insurance_product.insurer_name,
+            'includes_adh': pricing_options['includes_adh'],
+            'pricing_options': pricing_options['options']
+        })
+        for option in pricing_options['options']:
+            # Ties keep the first insurer in name order
+            if option['term'] not in cheapest or option['price'] < cheapest[option['term']]['price']:
+                cheapest[option['term']] = {
+                    **option,
+                    'insurer_name': insurance_product.insurer_name,
+                    'includes_adh': pricing_options['includes_adh']
+                }
+
+    return {
+        'product_category': product_category,
+        'quotes': quotes,
+        'cheapest_options': [cheapest[term] for term in sorted(cheapest)]
+    }
+
+
+def get_many_warranty_pricing_options(items, as_of=None):
+    """Get warranty pricing options for many items, grouped by category.
+
+    Returns a list aligned with items holding the same dict as
+    get_all_warranty_pricing_options, or None where no pricing was found.
+    With as_of each item is resolved against the band history instead.
+    """
+    if as_of:
+        return [get_all_warranty_pricing_options(item['product_price'], item['product_category'], as_of)
+                for item in items]
+
+    results = [None] * len(items)
+
+    by_category = {}
+    for position, item in enumerate(items):
+        try:
+            price = float(item['product_price'])
+        except (TypeError, ValueError):
+            continue
+        by_category.setdefault(item['product_category'], []).append((position, price))
+
+    for product_category, entries in by_category.items():
+        try:
+            insurance_product, pricing_bands = band_index.lookup_many(
+                product_category, [price for _, price in entries], insurer_name='AIG'
+            )
+        except Exception as e:
+            logger.error(f"Error getting warranty pricing options: {str(e)}")
+            continue
+
+        if not insurance_product:
+            logger.error(f"No active AIG insurance product found for category: {product_category}")
+            continue
+
+        for (position, _), pricing_band in zip(entries, pricing_bands):
+            if pricing_band:
+                results[position] = _build_pricing_options(insurance_product, pricing_band, product_category)
+
+    return results
+
+
+def _build_pricing_options(insurance_product, pricing_band, product_category):
+    """Build the pricing options response for a resolved pricing band"""
+    options = []
+
+    # Add 2-year option
+    if pricing_band.price_2_year:
+        options.append({
+            'term': 2,
+            'price': float(pricing_band.price_2_year),
+            'display_name': '2 Year'
+        })
+
+    # Add 3-year option
+    if pricing_band.price_3_year:
+        options.append({
+            'term': 3,
+            'price': float(pricing_band.price_3_year),
+            'display_name': '3 Year'
+        })
+
+    # Note: AIG pricing typically only has 2-year and 3-year options
+    # If you need 1-year options, you'd need to add that to the pricing bands
+
+    return {
+        'options': options,
+        'includes_adh': insurance_product.includes_adh,
+        'product_category': product_category
+    }
 
 
 def update_warranty_variant_price(access_token, shop_url, variant_id, price, session_token):
-    """Update warranty variant price in Shopify"""
+    """Update warranty variant price in Shopify.
+
+    Must not be called inside a get_db block: the request's connection is
+    returned to the pool before the Shopify round trip.
+    """
+    release_request_db()
     try:
         # Create variant title with session token
         variant_title = f"Protection - {session_token[:8]}"
@@ -384,17 +1134,18 @@ def update_warranty_variant_price(access_token, shop_url, variant_id, price, ses
             }
         }
         
-        response = requests.post(
-            f"https://{shop_url}/admin/api/2024-01/graphql.json",
-            headers={
-                "X-Shopify-Access-Token": access_token,
-                "Content-Type": "application/json"
-            },
-            json={
-                "query": mutation,
-                "variables": variables
-            }
-        )
+        with profile_span('shopify'):
+            response = requests.post(
+                f"https://{shop_url}/admin/api/2024-01/graphql.json",
+                headers={
+                    "X-Shopify-Access-Token": access_token,
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "query": mutation,
+                    "variables": variables
+                }
+            )
         
         if response.status_code == 200:
             result = response.json()
@@ -421,6 +1172,9 @@ def cleanup_old_variants():
             if not shop:
                 return jsonify({'error': 'Shop not found'}), 404
 
+        # Don't hold a pooled connection across the Shopify calls below
+        release_request_db()
+
         # Get all variants for the warranty product
         query = '''
         query getProductVariants($productId: ID!) {
@@ -439,19 +1193,20 @@ def cleanup_old_variants():
         }
         '''
         
-        response = requests.post(
-            f"https://{shop.shop_url}/admin/api/2024-01/graphql.json",
-            headers={
-                "X-Shopify-Access-Token": shop.access_token,
-                "Content-Type": "application/json"
-            },
-            json={
-                "query": query,
-                "variables": {
-                    "productId": f"gid://shopify/Product/{shop.product_id}"
+        with profile_span('shopify'):
+            response = requests.post(
+                f"https://{shop.shop_url}/admin/api/2024-01/graphql.json",
+                headers={
+                    "X-Shopify-Access-Token": shop.access_token,
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "query": query,
+                    "variables": {
+                        "productId": f"gid://shopify/Product/{shop.product_id}"
+                    }
                 }
-            }
-        )
+            )
         
         if response.status_code != 200:
             return jsonify({'error': 'Failed to get variants'}), 500
@@ -479,21 +1234,22 @@ def cleanup_old_variants():
                 }
                 '''
                 
-                delete_response = requests.post(
-                    f"https://{shop.shop_url}/admin/api/2024-01/graphql.json",
-                    headers={
-                        "X-Shopify-Access-Token": shop.access_token,
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "query": delete_mutation,
-                        "variables": {
-                            "input": {
-                                "id": variant['node']['id']
+                with profile_span('shopify'):
+                    delete_response = requests.post(
+                        f"https://{shop.shop_url}/admin/api/2024-01/graphql.json",
+                        headers={
+                            "X-Shopify-Access-Token": shop.access_token,
+                            "Content-Type": "application/json"
+                        },
+                        json={
+                            "query": delete_mutation,
+                            "variables": {
+                                "input": {
+                                    "id": variant['node']['id']
+                                }
                             }
                         }
-                    }
-                )
+                    )
                 
                 if delete_response.status_code == 200:
                     deleted_count += 1
@@ -4,6 +4,9 @@ import json
 from datetime import datetime
 from ..utils.auth import require_auth, get_shop_context
 from ..models.database import get_db, Shop, ShopSettings
+from ..services.shop_auth_cache import shop_auth_cache
+from ..services.quote_cache import quote_cache
+from ..services.offer_bundle_cache import offer_bundle_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,7 +22,7 @@ def get_shop_settings():
     try:
         shop_context = get_shop_context()
         
-        with get_db() as db:
+        with get_db(readonly=True, replica=False) as db:
             result = db.execute(
                 text('''
                     SELECT ss.*, s.shop_url
@@ -102,6 +105,9 @@ def update_shop_settings():
             settings['created_at'] = settings['created_at'].isoformat() if settings['created_at'] else None
             settings['updated_at'] = settings['updated_at'].isoformat() if settings['updated_at'] else None
             
+            db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
+            
             return jsonify({'settings': settings}), 200
             
     except Exception as e:
@@ -125,10 +131,14 @@ def regenerate_api_key():
                 {'api_key': api_key, 'shop_id': shop_context['shop_id']}
             )
 
-            return jsonify({
-                'message': 'API key regenerated successfully',
-                'api_key': api_key
-            }), 200
+        # Drop the cached key once the new one is committed
+        shop_auth_cache.invalidate(shop_context['shop_url'])
+        quote_cache.invalidate_shop(shop_context['shop_url'])
+
+        return jsonify({
+            'message': 'API key regenerated successfully',
+            'api_key': api_key
+        }), 200
 
     except Exception as e:
         logger.error(f"Error regenerating API key: {str(e)}")
@@ -151,7 +161,7 @@ def get_shop_me():
     try:
         shop_context = get_shop_context()
 
-        with get_db() as db:
+        with get_db(readonly=True, replica=False) as db:
             shop = db.query(Shop).filter_by(id=shop_context['shop_id']).first()
             if not shop:
                 return jsonify({'error': 'Shop not found'}), 404
@@ -181,7 +191,7 @@ def get_shop_stats():
     try:
         shop_context = get_shop_context()
         
-        with get_db() as db:
+        with get_db(readonly=True) as db:
             # Get counts
             stats = {}
             
@@ -251,6 +261,8 @@ def register_shop():
                 existing_shop.api_key = api_key
                 
                 db.commit()
+                shop_auth_cache.invalidate(shop_url)
+                quote_cache.invalidate_shop(shop_url)
 
                 return jsonify({
                     'message': 'Shop updated successfully',
@@ -274,6 +286,8 @@ def register_shop():
                 db.add(new_shop)
                 db.commit()
                 db.refresh(new_shop)
+                shop_auth_cache.invalidate(shop_url)
+                quote_cache.invalidate_shop(shop_url)
 
                 return jsonify({
                     'message': 'Shop registered successfully',
@@ -303,6 +317,8 @@ def uninstall_shop():
                 # Delete shop and all related data (cascade will handle related records)
                 db.delete(shop)
                 db.commit()
+                shop_auth_cache.invalidate(shop_url)
+                quote_cache.invalidate_shop(shop_url)
                 
                 return jsonify({'message': 'Shop uninstalled successfully'}), 200
             else:
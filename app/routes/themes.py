@@ -4,6 +4,7 @@ import json
 from datetime import datetime
 from ..utils.auth import require_auth, get_shop_context
 from ..models.database import get_db
+from ..services.offer_bundle_cache import offer_bundle_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +12,12 @@ logger = logging.getLogger(__name__)
 # Create the Blueprint
 themes_bp = Blueprint('themes', __name__)
 
+# Offers using a theme, from the idx_offers_shop_theme_id index
+THEME_USAGE_COUNT_QUERY = text('''
+    SELECT COUNT(*) FROM offers
+    WHERE shop_id = :shop_id AND theme_id = :theme_id
+''')
+
 
 @themes_bp.route('/themes', methods=['GET'])
 @require_auth
@@ -19,7 +26,7 @@ def list_themes():
     try:
         shop_context = get_shop_context()
         
-        with get_db() as db:
+        with get_db(readonly=True) as db:
             result = db.execute(
                 text('''
                     SELECT * FROM offer_themes
@@ -42,6 +49,53 @@ def list_themes():
         return jsonify({'error': 'Failed to list themes'}), 500
 
 
+@themes_bp.route('/themes/usage', methods=['GET'])
+@require_auth
+def get_themes_usage():
+    """Get the number of offers using each of the shop's themes"""
+    try:
+        shop_context = get_shop_context()
+
+        with get_db(readonly=True) as db:
+            result = db.execute(
+                text('''
+                    SELECT t.id AS theme_id, t.name, COUNT(o.id) AS offer_count
+                    FROM offer_themes t
+                    LEFT JOIN offers o ON o.shop_id = t.shop_id AND o.theme_id = t.id
+                    WHERE t.shop_id = :shop_id
+                    GROUP BY t.id, t.name
+                    ORDER BY t.id
+                '''),
+                {'shop_id': shop_context['shop_id']}
+            ).mappings().all()
+
+            return jsonify({'usage': [dict(row) for row in result]}), 200
+
+    except Exception as e:
+        logger.error(f"Error getting theme usage: {str(e)}")
+        return jsonify({'error': 'Failed to get theme usage'}), 500
+
+
+@themes_bp.route('/themes/<int:theme_id>/usage', methods=['GET'])
+@require_auth
+def get_theme_usage(theme_id):
+    """Get the number of offers using a theme"""
+    try:
+        shop_context = get_shop_context()
+
+        with get_db(readonly=True) as db:
+            offer_count = db.execute(
+                THEME_USAGE_COUNT_QUERY,
+                {'theme_id': theme_id, 'shop_id': shop_context['shop_id']}
+            ).scalar()
+
+            return jsonify({'theme_id': theme_id, 'offer_count': offer_count}), 200
+
+    except Exception as e:
+        logger.error(f"Error getting theme usage: {str(e)}")
+        return jsonify({'error': 'Failed to get theme usage'}), 500
+
+
 @themes_bp.route('/themes/<int:theme_id>', methods=['GET'])
 @require_auth
 def get_theme(theme_id):
@@ -49,7 +103,7 @@ def get_theme(theme_id):
     try:
         shop_context = get_shop_context()
         
-        with get_db() as db:
+        with get_db(readonly=True, replica=False) as db:
             result = db.execute(
                 text('''
                     SELECT * FROM offer_themes
@@ -124,6 +178,9 @@ def create_theme():
             theme = dict(theme_result)
             theme['created_at'] = theme['created_at'].isoformat() if theme['created_at'] else None
             
+            db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
+            
             return jsonify({'theme': theme}), 201
             
     except Exception as e:
@@ -196,6 +253,9 @@ def update_theme(theme_id):
             theme = dict(result)
             theme['created_at'] = theme['created_at'].isoformat() if theme['created_at'] else None
             
+            db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
+            
             return jsonify({'theme': theme}), 200
             
     except Exception as e:
@@ -228,9 +288,9 @@ def delete_theme(theme_id):
             
             # Check if theme is being used by any offers
             offers_using_theme = db.execute(
-                text('SELECT COUNT(*) FROM offers WHERE theme::text LIKE :theme_id AND shop_id = :shop_id'),
+                THEME_USAGE_COUNT_QUERY,
                 {
-                    'theme_id': f'%"id": {theme_id}%',
+                    'theme_id': theme_id,
                     'shop_id': shop_context['shop_id']
                 }
             ).fetchone()[0]
@@ -250,6 +310,9 @@ def delete_theme(theme_id):
             if delete_result.rowcount == 0:
                 return jsonify({'error': 'Theme not found'}), 404
             
+            db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
+            
             return jsonify({'message': 'Theme deleted successfully'}), 200
             
     except Exception as e:
@@ -289,6 +352,9 @@ def set_default_theme(theme_id):
                 {'theme_id': theme_id}
             )
             
+            db.commit()
+            offer_bundle_cache.invalidate(shop_context['shop_id'])
+            
             return jsonify({'message': 'Default theme updated successfully'}), 200
             
     except Exception as e:
@@ -6,6 +6,8 @@ import hashlib
 import logging
 from ..models.database import get_db
 from ..config import Config
+from ..services.shop_auth_cache import shop_auth_cache
+from ..services.quote_cache import quote_cache
 import base64
 
 logger = logging.getLogger(__name__)
@@ -115,6 +117,8 @@ def app_uninstalled():
                 text('UPDATE shops SET access_token = NULL, updated_at = now() WHERE shop_url = :shop_url'),
                 {'shop_url': shop_domain}
             )
+        shop_auth_cache.invalidate(shop_domain)
+        quote_cache.invalidate_shop(shop_domain)
         
         logger.info(f"App uninstalled for shop: {shop_domain}")
         return jsonify({'message': 'App uninstalled successfully'}), 200
@@ -0,0 +1,420 @@
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text, DateTime
+
+from ..config import Config
+from ..models.database import get_db
+
+logger = logging.getLogger(__name__)
+
+InsuranceProduct = namedtuple('InsuranceProduct', [
+    'id', 'insurer_name', 'product_category', 'includes_adh'
+])
+
+PricingBand = namedtuple('PricingBand', [
+    'id', 'insurance_product_id', 'msrp_min', 'msrp_max', 'price_2_year', 'price_3_year'
+])
+
+
+class BandTable:
+    """Pricing bands for a single insurance product, sorted by msrp_min.
+
+    Bands may overlap. The band starting closest below a price wins; when it
+    ends before the price, an earlier, wider band may still cover it, so
+    reach[i] (the highest msrp_max among bands[:i + 1]) says whether a
+    backwards scan can find one.
+    """
+
+    def __init__(self, bands: List[PricingBand]):
+        self.bands = sorted(bands, key=lambda band: (band.msrp_min, band.id))
+        self.msrp_mins = [band.msrp_min for band in self.bands]
+        self.reach: List[float] = []
+        for band in self.bands:
+            self.reach.append(max(band.msrp_max, self.reach[-1]) if self.reach else band.msrp_max)
+
+    def find(self, price: float) -> Optional[PricingBand]:
+        """Return the band where msrp_min <= price <= msrp_max, if any"""
+        return self._covering(bisect.bisect_right(self.msrp_mins, price) - 1, price)
+
+    def find_many(self, prices: List[float]) -> List[Optional[PricingBand]]:
+        """Resolve many prices in a single pass over the sorted bands"""
+        results: List[Optional[PricingBand]] = [None] * len(prices)
+        bands = self.bands
+        i = -1
+        for position in sorted(range(len(prices)), key=prices.__getitem__):
+            price = prices[position]
+            # Advance to the last band starting at or below this price
+            while i + 1 < len(bands) and bands[i + 1].msrp_min <= price:
+                i += 1
+            results[position] = self._covering(i, price)
+        return results
+
+    def _covering(self, i: int, price: float) -> Optional[PricingBand]:
+        # bands[i] is the last band starting at or below price
+        if i < 0 or self.reach[i] < price:
+            return None
+        while self.bands[i].msrp_max < price:
+            i -= 1
+        return self.bands[i]
+
+
+class MergedBandTable:
+    """Pricing bands of every insurer for one category, split into price segments.
+
+    Every msrp_min and msrp_max is a breakpoint; within a segment the set of
+    covering bands is fixed, so one bisect finds the bands of all insurers
+    that may cover a price.
+    """
+
+    def __init__(self, bands: List[PricingBand]):
+        self.breakpoints = sorted({band.msrp_min for band in bands} | {band.msrp_max for band in bands})
+        by_min = sorted(bands, key=lambda band: (band.msrp_min, band.insurance_product_id, band.id))
+        self.segments: List[List[PricingBand]] = []
+
+        live: List[PricingBand] = []
+        next_band = 0
+        for start in self.breakpoints:
+            entering = []
+            while next_band < len(by_min) and by_min[next_band].msrp_min <= start:
+                entering.append(by_min[next_band])
+                next_band += 1
+            # Each segment gets its own list, so later segments never alias earlier ones
+            live = [band for band in live + entering if band.msrp_max >= start]
+            self.segments.append(live)
+
+    def find_all(self, price: float) -> List[PricingBand]:
+        """Return every band where msrp_min <= price <= msrp_max"""
+        i = bisect.bisect_right(self.breakpoints, price) - 1
+        if i < 0:
+            return []
+        # A band ending exactly on the segment start only covers that point
+        return [band for band in self.segments[i] if price <= band.msrp_max]
+
+
+class BandTimeline:
+    """Pricing band history for one (insurer, category), split into epochs.
+
+    Every effective_date and expiry_date is a breakpoint; between two
+    consecutive breakpoints the set of live bands is fixed and held as a
+    BandTable. An as-of lookup is a bisect over the breakpoints followed by a
+    bisect within that epoch's table.
+    """
+
+    def __init__(self, bands: List[Tuple[PricingBand, datetime, Optional[datetime]]], product_id: int):
+        self.product_id = product_id  # Most recent insurance product for this (insurer, category)
+        starts: Dict[datetime, List[PricingBand]] = {}
+        ends: Dict[datetime, List[PricingBand]] = {}
+        for band, effective_date, expiry_date in bands:
+            if expiry_date is not None and expiry_date <= effective_date:
+                continue
+            starts.setdefault(effective_date, []).append(band)
+            if expiry_date is not None:
+                ends.setdefault(expiry_date, []).append(band)
+
+        self.breakpoints = sorted(set(starts) | set(ends))
+        self.tables: List[Optional[BandTable]] = []
+
+        live: Dict[int, PricingBand] = {}
+        for moment in self.breakpoints:
+            for band in ends.get(moment, ()):
+                live.pop(band.id, None)
+            for band in starts.get(moment, ()):
+                live[band.id] = band
+            self.tables.append(BandTable(list(live.values())) if live else None)
+
+    def find(self, price: float, as_of: datetime) -> Optional[PricingBand]:
+        """Return the band live at as_of where msrp_min <= price <= msrp_max, if any"""
+        i = bisect.bisect_right(self.breakpoints, as_of) - 1
+        if i < 0 or self.tables[i] is None:
+            return None
+        return self.tables[i].find(price)
+
+
+class _Snapshot:
+    """Immutable compiled view of the active pricing bands"""
+
+    def __init__(self, products: Dict[Tuple[str, str], InsuranceProduct],
+                 tables: Dict[int, BandTable], merged: Dict[str, MergedBandTable], version: str):
+        self.products = products
+        self.products_by_id = {product.id: product for product in products.values()}
+        self.tables = tables
+        self.merged = merged
+        self.version = version
+
+
+class _HistorySnapshot:
+    """Immutable compiled view of the full pricing band history"""
+
+    def __init__(self, products: Dict[int, InsuranceProduct],
+                 timelines: Dict[Tuple[str, str], BandTimeline], version: str):
+        self.products = products
+        self.timelines = timelines
+        self.version = version
+
+
+class BandIndexUnavailable(Exception):
+    """The index has no bands loaded yet and may not load them on the caller's thread"""
+
+
+class _RefreshingIndex:
+    """Loads rows once and re-reads them every ttl seconds, recompiling only on change"""
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = Config.PRICING_INDEX_TTL if ttl is None else ttl
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        # Set by the async storefront app, whose background task keeps the index
+        # fresh; lookups then never reload on the caller's thread (the event loop)
+        self.background_refresh = False
+
+    @property
+    def version(self) -> Optional[str]:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else None
+
+    def invalidate(self):
+        """Force the next lookup (or background refresh) to re-read the band rows"""
+        self._checked_at = 0.0
+
+    def due_for_refresh(self, interval: float) -> bool:
+        """Whether a background refresher should re-read the rows now"""
+        return self._snapshot is None or time.monotonic() - self._checked_at >= interval
+
+    def _ensure_fresh(self):
+        if self.background_refresh:
+            # Serve what is loaded, however old; the background task reloads it
+            snapshot = self._snapshot
+            if snapshot is None:
+                raise BandIndexUnavailable(f"{self._name.capitalize()} has not loaded yet")
+            return snapshot
+
+        if self._snapshot is None or self._is_stale():
+            with self._lock:
+                if self._snapshot is None or self._is_stale():
+                    self.refresh()
+        return self._snapshot
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.ttl
+
+    def refresh(self):
+        """Re-read the band rows and recompile the index if they changed"""
+        try:
+            with get_db(readonly=True) as db:
+                rows = self._load_rows(db)
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            # Keep serving the last good snapshot rather than failing pricing
+            logger.error(f"Error refreshing {self._name}: {str(e)}")
+            self._checked_at = time.monotonic()
+            return
+
+        self.rebuild_from_rows(rows)
+
+    async def refresh_async(self, db):
+        """Re-read the band rows on an AsyncSession and recompile the index if they changed"""
+        try:
+            rows = (await db.execute(self._rows_query)).mappings().all()
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            logger.error(f"Error refreshing {self._name}: {str(e)}")
+            self._checked_at = time.monotonic()
+            return
+
+        self.rebuild_from_rows(rows)
+
+    def _load_rows(self, db):
+        return db.execute(self._rows_query).mappings().all()
+
+    def rebuild_from_rows(self, rows):
+        """Compile a new snapshot from band rows unless nothing changed"""
+        version = self._digest(rows)
+        if self._snapshot is None or self._snapshot.version != version:
+            self._snapshot = self._compile(rows, version)
+            logger.info(f"{self._name.capitalize()} compiled: version={version}, rows={len(rows)}")
+        self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _digest(rows) -> str:
+        digest = hashlib.sha1()
+        for row in rows:
+            digest.update(repr(tuple(row.values())).encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def _band_from_row(row) -> PricingBand:
+        return PricingBand(
+            id=row['band_id'],
+            insurance_product_id=row['insurance_product_id'],
+            msrp_min=float(row['msrp_min']),
+            msrp_max=float(row['msrp_max']),
+            price_2_year=float(row['price_2_year']) if row['price_2_year'] is not None else None,
+            price_3_year=float(row['price_3_year']) if row['price_3_year'] is not None else None
+        )
+
+    @staticmethod
+    def _product_from_row(row) -> InsuranceProduct:
+        return InsuranceProduct(
+            id=row['insurance_product_id'],
+            insurer_name=row['insurer_name'],
+            product_category=row['product_category'],
+            includes_adh=bool(row['includes_adh'])
+        )
+
+
+class BandIndex(_RefreshingIndex):
+    """Per-worker in-memory index of the active warranty pricing bands.
+
+    The active band set is tiny and changes rarely, so it is loaded once and
+    answered with bisect lookups. Every PRICING_INDEX_TTL seconds the rows are
+    re-read and the index is only recompiled when their digest changes.
+    """
+
+    _name = 'pricing band index'
+
+    def lookup(self, product_category: str, product_price,
+               insurer_name: str = 'AIG') -> Tuple[Optional[InsuranceProduct], Optional[PricingBand]]:
+        """Resolve the active insurance product and pricing band for a price"""
+        snapshot = self._ensure_fresh()
+        price = float(product_price)
+
+        insurance_product = snapshot.products.get((insurer_name, product_category))
+        if not insurance_product:
+            return None, None
+
+        table = snapshot.tables.get(insurance_product.id)
+        return insurance_product, table.find(price) if table else None
+
+    def lookup_many(self, product_category: str, product_prices: List,
+                    insurer_name: str = 'AIG') -> Tuple[Optional[InsuranceProduct], List[Optional[PricingBand]]]:
+        """Resolve pricing bands for many prices within one category"""
+        snapshot = self._ensure_fresh()
+        prices = [float(price) for price in product_prices]
+
+        insurance_product = snapshot.products.get((insurer_name, product_category))
+        table = snapshot.tables.get(insurance_product.id) if insurance_product else None
+        if not table:
+            return insurance_product, [None] * len(prices)
+
+        return insurance_product, table.find_many(prices)
+
+    def lookup_all(self, product_category: str, product_price) -> List[Tuple[InsuranceProduct, PricingBand]]:
+        """Resolve the pricing band of every active insurer for a price, ordered by insurer"""
+        snapshot = self._ensure_fresh()
+        price = float(product_price)
+
+        merged = snapshot.merged.get(product_category)
+        if not merged:
+            return []
+
+        # Like BandTable.find, a product whose bands overlap at the price answers with its last band
+        matches: Dict[int, PricingBand] = {}
+        for band in merged.find_all(price):
+            matches[band.insurance_product_id] = band
+
+        return sorted(
+            ((snapshot.products_by_id[product_id], band) for product_id, band in matches.items()),
+            key=lambda match: (match[0].insurer_name, match[0].id)
+        )
+
+    _rows_query = text('''
+        SELECT p.id AS insurance_product_id, p.insurer_name, p.product_category, p.includes_adh,
+               b.id AS band_id, b.msrp_min, b.msrp_max, b.price_2_year, b.price_3_year
+        FROM warranty_insurance_products p
+        LEFT JOIN warranty_pricing_bands b
+            ON b.insurance_product_id = p.id AND b.expiry_date IS NULL
+        WHERE p.is_active = true
+        ORDER BY p.id, b.msrp_min, b.id
+    ''')
+
+    @classmethod
+    def _compile(cls, rows, version: str) -> _Snapshot:
+        products: Dict[Tuple[str, str], InsuranceProduct] = {}
+        bands: Dict[int, List[PricingBand]] = {}
+
+        for row in rows:
+            key = (row['insurer_name'], row['product_category'])
+            # Rows are ordered by product id, so the first active product wins
+            if key not in products:
+                products[key] = cls._product_from_row(row)
+            if row['band_id'] is None:
+                continue
+            bands.setdefault(row['insurance_product_id'], []).append(cls._band_from_row(row))
+
+        tables = {product_id: BandTable(product_bands) for product_id, product_bands in bands.items()}
+
+        # Merge the bands of every insurer's winning product per category for fan-out quotes
+        by_category: Dict[str, List[PricingBand]] = {}
+        for (_, product_category), product in products.items():
+            by_category.setdefault(product_category, []).extend(tables[product.id].bands if product.id in tables else [])
+        merged = {category: MergedBandTable(category_bands) for category, category_bands in by_category.items()}
+
+        return _Snapshot(products, tables, merged, version)
+
+
+class BandHistoryIndex(_RefreshingIndex):
+    """Per-worker in-memory index of every pricing band ever effective.
+
+    Answers what was quoted for (category, price, as_of) in logarithmic time
+    without scanning the band history per request. Bands of inactive products
+    are included, since a product may have been live at the requested time.
+    """
+
+    _name = 'pricing band history index'
+
+    def lookup_as_of(self, product_category: str, product_price, as_of: datetime,
+                     insurer_name: str = 'AIG') -> Tuple[Optional[InsuranceProduct], Optional[PricingBand]]:
+        """Resolve the insurance product and pricing band that applied to a price at as_of"""
+        snapshot = self._ensure_fresh()
+        price = float(product_price)
+
+        timeline = snapshot.timelines.get((insurer_name, product_category))
+        if not timeline:
+            return None, None
+
+        pricing_band = timeline.find(price, as_of)
+        if not pricing_band:
+            # Report the product so callers can tell a missing band from a missing category
+            return snapshot.products.get(timeline.product_id), None
+        return snapshot.products[pricing_band.insurance_product_id], pricing_band
+
+    _rows_query = text('''
+        SELECT p.id AS insurance_product_id, p.insurer_name, p.product_category, p.includes_adh,
+               b.id AS band_id, b.msrp_min, b.msrp_max, b.price_2_year, b.price_3_year,
+               b.effective_date, b.expiry_date
+        FROM warranty_insurance_products p
+        JOIN warranty_pricing_bands b ON b.insurance_product_id = p.id
+        ORDER BY p.id, b.effective_date, b.id
+    ''').columns(effective_date=DateTime(), expiry_date=DateTime())  # datetimes on every dialect, e.g. SQLite
+
+    @classmethod
+    def _compile(cls, rows, version: str) -> _HistorySnapshot:
+        products: Dict[int, InsuranceProduct] = {}
+        history: Dict[Tuple[str, str], list] = {}
+        latest_product: Dict[Tuple[str, str], int] = {}
+
+        for row in rows:
+            key = (row['insurer_name'], row['product_category'])
+            products.setdefault(row['insurance_product_id'], cls._product_from_row(row))
+            latest_product[key] = row['insurance_product_id']
+            history.setdefault(key, []).append(
+                (cls._band_from_row(row), row['effective_date'], row['expiry_date'])
+            )
+
+        timelines = {key: BandTimeline(bands, latest_product[key]) for key, bands in history.items()}
+        return _HistorySnapshot(products, timelines, version)
+
+
+# Global per-worker band indexes; the history index loads on its first as-of lookup
+band_index = BandIndex()
+band_history_index = BandHistoryIndex()
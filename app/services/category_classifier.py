@@ -0,0 +1,104 @@
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever CATEGORY_KEYWORDS changes so the embed refreshes its cached copy
+CATEGORY_KEYWORDS_VERSION = 1
+
+# Shared keyword table, ordered by priority: when a title matches keywords from
+# several categories, the earliest category wins. Keywords match whole words
+# only, so plurals are listed explicitly ('pcs' is left out on purpose, it
+# usually means "pieces").
+CATEGORY_KEYWORDS = [
+    {
+        'key': 'tvs',
+        'product_category': 'TVs',
+        'keywords': ['tv', 'tvs', 'television', 'televisions']
+    },
+    {
+        'key': 'tablets',
+        'product_category': 'Tablets',
+        'keywords': ['tablet', 'tablets', 'ipad', 'surface']
+    },
+    {
+        'key': 'desktops_laptops',
+        'product_category': 'Desktops, Laptops',
+        'keywords': ['laptop', 'laptops', 'notebook', 'notebooks', 'desktop', 'desktops',
+                     'computer', 'computers', 'pc', 'macbook', 'imac', 'mac pro']
+    },
+    {
+        'key': 'consumer_electronics',
+        'product_category': 'Consumer Electronics',
+        'keywords': ['monitor', 'phone', 'phones', 'smartphone', 'smartphones', 'camera', 'cameras',
+                     'headphones', 'speaker', 'speakers', 'gaming']
+    }
+]
+
+DEFAULT_CATEGORY = 'consumer_electronics'
+
+
+class CategoryClassifier:
+    """Classifies product titles into pricing categories with one compiled regex.
+
+    Every keyword of every category is folded into a single alternation with a
+    named group per category, so a title is scanned once regardless of how
+    many keywords the table holds.
+    """
+
+    def __init__(self, table: List[Dict], default: str = DEFAULT_CATEGORY):
+        self.table = table
+        self.default = default
+        self._priority = {entry['key']: i for i, entry in enumerate(table)}
+        self._product_categories = {entry['key']: entry['product_category'] for entry in table}
+        self._pattern = self._compile(table)
+
+    @staticmethod
+    def _compile(table: List[Dict]) -> re.Pattern:
+        groups = []
+        for entry in table:
+            # Longest first so multi-word keywords win over their prefixes
+            keywords = sorted(entry['keywords'], key=len, reverse=True)
+            alternation = '|'.join(r'\s+'.join(map(re.escape, keyword.split())) for keyword in keywords)
+            groups.append(f"(?P<{entry['key']}>{alternation})")
+        return re.compile(r'\b(?:' + '|'.join(groups) + r')\b', re.IGNORECASE)
+
+    def classify_title(self, title: Optional[str]) -> str:
+        """Return the category key for a product title"""
+        best = None
+        for match in self._pattern.finditer(title or ''):
+            key = match.lastgroup
+            if best is None or self._priority[key] < self._priority[best]:
+                best = key
+                if self._priority[best] == 0:
+                    break
+        return best or self.default
+
+    def classify(self, product_info: Dict) -> str:
+        """Return the category key for a product info dict"""
+        return self.classify_title(product_info.get('title'))
+
+    def classify_many(self, product_infos: Iterable[Dict]) -> List[str]:
+        """Return category keys for many products, e.g. for catalog jobs"""
+        return [self.classify_title(product_info.get('title')) for product_info in product_infos]
+
+    def product_category(self, key: str) -> str:
+        """Map a category key to the product_category used by the pricing tables"""
+        return self._product_categories.get(key, self._product_categories[self.default])
+
+    def product_category_for_title(self, title: Optional[str]) -> str:
+        """Classify a title straight to its pricing product_category"""
+        return self.product_category(self.classify_title(title))
+
+    def to_dict(self) -> Dict:
+        """Versioned keyword table for clients such as the storefront embed"""
+        return {
+            'version': CATEGORY_KEYWORDS_VERSION,
+            'default': self.default,
+            'categories': self.table
+        }
+
+
+# Global classifier compiled once per worker
+category_classifier = CategoryClassifier(CATEGORY_KEYWORDS)
@@ -0,0 +1,135 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Mapping, Optional
+
+from ..config import Config
+
+# {{name}} with no inner whitespace, as the layout editor writes them
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+# Offer fields a layout can reference; other {{...}} text is left as written
+DEFAULT_PLACEHOLDERS = ('headline', 'body', 'button_text', 'image_url')
+
+
+class CompiledLayout:
+    """A layout's HTML parsed once into literal and slot segments.
+
+    literals always holds one more entry than slots: rendering interleaves
+    them, so each render is a single join instead of a pass per placeholder.
+    """
+
+    __slots__ = ('literals', 'slots')
+
+    def __init__(self, source: str, placeholders: Iterable[str]):
+        placeholders = frozenset(placeholders)
+        self.literals = []
+        self.slots = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            if match.group(1) not in placeholders:
+                continue
+            self.literals.append(source[position:match.start()])
+            self.slots.append(match.group(1))
+            position = match.end()
+        self.literals.append(source[position:])
+
+    def render(self, values: Mapping) -> str:
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(slot)
+            parts.append('' if value is None else str(value))
+            parts.append(literal)
+        return ''.join(parts)
+
+
+class LayoutRenderer:
+    """Per-worker layout template compiler with LRUs of compiled templates and rendered offers.
+
+    Templates are compiled once per distinct HTML. Rendered offers are keyed by
+    (layout id, layout updated_at, offer id, offer updated_at), so editing
+    either row changes the key and stale output is never served.
+    """
+
+    def __init__(self, placeholders: Iterable[str] = DEFAULT_PLACEHOLDERS,
+                 max_templates: Optional[int] = None, max_renders: Optional[int] = None):
+        self.placeholders = frozenset(placeholders)
+        self.max_templates = Config.LAYOUT_TEMPLATE_CACHE_SIZE if max_templates is None else max_templates
+        self.max_renders = Config.LAYOUT_RENDER_CACHE_SIZE if max_renders is None else max_renders
+        self._templates = OrderedDict()
+        self._renders = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def add_placeholder(self, name: str):
+        """Make {{name}} a slot; compiled templates and renders are dropped"""
+        with self._lock:
+            self.placeholders = self.placeholders | {name}
+            self._templates.clear()
+            self._renders.clear()
+
+    def compile(self, source: str) -> CompiledLayout:
+        with self._lock:
+            compiled = self._templates.get(source)
+            if compiled is not None:
+                self._templates.move_to_end(source)
+                return compiled
+            placeholders = self.placeholders
+
+        compiled = CompiledLayout(source, placeholders)
+        with self._lock:
+            if placeholders is not self.placeholders:
+                # add_placeholder ran meanwhile; don't cache a template compiled without it
+                return compiled
+            self._templates[source] = compiled
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+        return compiled
+
+    def render(self, source: Optional[str], values: Mapping) -> str:
+        """Render layout HTML with values, e.g. sample data for a preview"""
+        return self.compile(source or '').render(values)
+
+    def render_offer(self, layout: Mapping, offer: Mapping) -> str:
+        """Render an offer into its layout, served from the render cache when neither row changed.
+
+        layout needs id, updated_at and preview_html; offer needs id,
+        updated_at and the placeholder fields.
+        """
+        key = (layout['id'], layout['updated_at'], offer['id'], offer['updated_at'])
+        with self._lock:
+            rendered = self._renders.get(key)
+            if rendered is not None:
+                self._renders.move_to_end(key)
+                self.hits += 1
+                return rendered
+            self.misses += 1
+
+        rendered = self.render(layout['preview_html'], offer)
+        with self._lock:
+            self._renders[key] = rendered
+            while len(self._renders) > self.max_renders:
+                self._renders.popitem(last=False)
+        return rendered
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self._renders.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'templates': len(self._templates),
+                'renders': len(self._renders),
+                'max_templates': self.max_templates,
+                'max_renders': self.max_renders,
+                'placeholders': sorted(self.placeholders)
+            }
+
+
+# Global per-worker layout renderer
+layout_renderer = LayoutRenderer()
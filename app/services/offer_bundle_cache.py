@@ -0,0 +1,177 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Optional
+
+from sqlalchemy import text, DateTime, JSON
+
+from ..config import Config
+from ..models.database import get_db
+from .layout_templates import layout_renderer
+
+OfferBundle = namedtuple('OfferBundle', ['etag', 'payload', 'expires_at'])
+
+# The shop's newest active offer and its layout
+ACTIVE_OFFER_QUERY = text('''
+    SELECT o.id, o.headline, o.body, o.image_url, o.button_text, o.button_url, o.theme,
+           o.theme_id, o.layout_id, o.updated_at,
+           ol.name AS layout_name, ol.description AS layout_description,
+           ol.css_classes AS layout_css_classes, ol.preview_html AS layout_preview_html,
+           ol.updated_at AS layout_updated_at
+    FROM offers o
+    LEFT JOIN offer_layouts ol ON o.layout_id = ol.id
+    WHERE o.shop_id = :shop_id AND o.status = 'active'
+    ORDER BY o.created_at DESC, o.id DESC
+    LIMIT 1
+''').columns(theme=JSON(), updated_at=DateTime(), layout_updated_at=DateTime())
+
+# The theme the offer references, else the shop's default theme
+THEME_QUERY = text('''
+    SELECT id, name, primary_color, secondary_color, accent_color, is_default
+    FROM offer_themes
+    WHERE shop_id = :shop_id AND (id = :theme_id OR is_default = true)
+    ORDER BY CASE WHEN id = :theme_id THEN 0 ELSE 1 END
+    LIMIT 1
+''')
+
+SETTINGS_QUERY = text('''
+    SELECT show_offer_on_checkout, show_email_optin
+    FROM shop_settings
+    WHERE shop_id = :shop_id
+''')
+
+
+class OfferBundleCache:
+    """Per-worker TTL/LRU cache of a shop's storefront snapshot: the active
+    offer with its theme and layout, the offer rendered into the layout, and
+    the checkout settings.
+
+    Routes that write offers, themes, layouts or shop settings invalidate the
+    shop's entry once committed; other workers pick the change up within
+    OFFER_BUNDLE_CACHE_TTL seconds.
+    """
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl = Config.OFFER_BUNDLE_CACHE_TTL if ttl is None else ttl
+        self.max_entries = Config.OFFER_BUNDLE_CACHE_SIZE if max_entries is None else max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, shop_id: int) -> Optional[OfferBundle]:
+        with self._lock:
+            entry = self._entries.get(shop_id)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self._entries[shop_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(shop_id)
+            self.hits += 1
+            return entry
+
+    def load(self, shop_id: int) -> OfferBundle:
+        """Build and cache the shop's snapshot from the primary, so a write is seen as soon as it commits"""
+        with get_db(readonly=True, replica=False) as db:
+            offer = db.execute(ACTIVE_OFFER_QUERY, {'shop_id': shop_id}).mappings().first()
+            theme = db.execute(THEME_QUERY, {'shop_id': shop_id, 'theme_id': _theme_id(offer)}).mappings().first()
+            settings = db.execute(SETTINGS_QUERY, {'shop_id': shop_id}).mappings().first()
+        return self.put(shop_id, offer, theme, settings)
+
+    async def load_async(self, db, shop_id: int) -> OfferBundle:
+        """load on an AsyncSession (see app/asgi.py)"""
+        offer = (await db.execute(ACTIVE_OFFER_QUERY, {'shop_id': shop_id})).mappings().first()
+        theme = (await db.execute(THEME_QUERY, {'shop_id': shop_id, 'theme_id': _theme_id(offer)})).mappings().first()
+        settings = (await db.execute(SETTINGS_QUERY, {'shop_id': shop_id})).mappings().first()
+        return self.put(shop_id, offer, theme, settings)
+
+    def put(self, shop_id: int, offer, theme, settings) -> OfferBundle:
+        payload = _build_payload(offer, theme, settings)
+        etag = hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:20]
+        entry = OfferBundle(etag, payload, time.monotonic() + self.ttl)
+
+        with self._lock:
+            self._entries[shop_id] = entry
+            self._entries.move_to_end(shop_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, shop_id: int):
+        with self._lock:
+            self._entries.pop(shop_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl
+            }
+
+
+def _theme_id(offer):
+    return offer['theme_id'] if offer else None
+
+
+def _build_payload(offer, theme, settings) -> dict:
+    layout = None
+    rendered_html = None
+    if offer and offer['layout_id'] is not None:
+        # The offer rendered into its layout; reused across snapshot rebuilds
+        # until the offer or the layout changes
+        rendered_html = layout_renderer.render_offer({
+            'id': offer['layout_id'],
+            'updated_at': offer['layout_updated_at'],
+            'preview_html': offer['layout_preview_html']
+        }, offer)
+        layout = {
+            'id': offer['layout_id'],
+            'name': offer['layout_name'],
+            'description': offer['layout_description'],
+            'css_classes': offer['layout_css_classes'],
+            'preview_html': offer['layout_preview_html']
+        }
+
+    return {
+        'offer': {
+            'id': offer['id'],
+            'headline': offer['headline'],
+            'body': offer['body'],
+            'image_url': offer['image_url'],
+            'button_text': offer['button_text'],
+            'button_url': offer['button_url'],
+            'theme': offer['theme'],
+            'layout_id': offer['layout_id'],
+            'updated_at': offer['updated_at'].isoformat() if offer['updated_at'] else None
+        } if offer else None,
+        'theme': {
+            'id': theme['id'],
+            'name': theme['name'],
+            'primary_color': theme['primary_color'],
+            'secondary_color': theme['secondary_color'],
+            'accent_color': theme['accent_color'],
+            'is_default': bool(theme['is_default'])
+        } if theme else None,
+        'layout': layout,
+        'rendered_html': rendered_html,
+        # A shop without a settings row gets the ShopSettings column defaults
+        'settings': {
+            'show_offer_on_checkout': bool(settings['show_offer_on_checkout']) if settings else True,
+            'show_email_optin': bool(settings['show_email_optin']) if settings else True
+        }
+    }
+
+
+# Global per-worker offer bundle cache
+offer_bundle_cache = OfferBundleCache()
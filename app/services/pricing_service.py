@@ -1,45 +1,210 @@
-import pandas as pd
+import numpy as np
 import os
+import hashlib
 import logging
-from typing import Dict, Optional, Tuple
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
 from pathlib import Path
+from .category_classifier import category_classifier
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# Source workbook and the compiled snapshot regenerated whenever its hash changes
+PRICING_WORKBOOK_PATH = Path(__file__).parent.parent / 'static' / 'aig_pricing' / 'AIG_ElectronicsPricing.xlsx'
+PRICING_SNAPSHOT_PATH = PRICING_WORKBOOK_PATH.with_suffix('.npz')
+
+# Bump when the snapshot layout changes so stale snapshots are rebuilt
+SNAPSHOT_FORMAT = 1
+
+# Worksheet for each pricing category
+PRICING_SHEETS = {
+    'consumer_electronics': 'Consumer Electronics (includes ADH)',
+    'desktops_laptops': 'Desktops, Laptops (includes ADH)',
+    'tablets': 'Tablets (includes ADH)',
+    'tvs': 'TVs (does not include ADH)'
+}
+
+# Warranty terms offered by the pricing sheets, in column order
+PRICING_TERMS = (2, 3)
+
+# Whether each category's plan includes Accidental Damage from Handling
+CATEGORY_INCLUDES_ADH = {
+    'consumer_electronics': True,
+    'desktops_laptops': True,
+    'tablets': True,
+    'tvs': False
+}
+
+
+class PricingTable:
+    """A processed pricing sheet held as contiguous NumPy arrays sorted by min MSRP"""
+
+    def __init__(self, min_msrp: np.ndarray, max_msrp: np.ndarray, prices: np.ndarray,
+                 msrp_bands: List[str], includes_adh: bool):
+        self.min_msrp = np.ascontiguousarray(min_msrp, dtype=np.float64)
+        self.max_msrp = np.ascontiguousarray(max_msrp, dtype=np.float64)
+        self.prices = np.ascontiguousarray(prices, dtype=np.float64)  # shape (bands, len(PRICING_TERMS))
+        self.msrp_bands = msrp_bands
+        self.includes_adh = includes_adh
+
+    @classmethod
+    def from_dataframe(cls, df: 'pd.DataFrame', category: str) -> 'PricingTable':
+        df = df.sort_values('min_msrp', kind='stable')
+        price_columns = [f'{term}-year Price' for term in PRICING_TERMS]
+        prices = np.column_stack([
+            df[col].to_numpy(dtype=np.float64) if col in df.columns else np.full(len(df), np.nan)
+            for col in price_columns
+        ]) if len(df) else np.empty((0, len(PRICING_TERMS)))
+        return cls(
+            min_msrp=df['min_msrp'].to_numpy(dtype=np.float64),
+            max_msrp=df['max_msrp'].to_numpy(dtype=np.float64),
+            prices=prices,
+            msrp_bands=[str(band) for band in df['MSRP Band']],
+            includes_adh=CATEGORY_INCLUDES_ADH.get(category, False)
+        )
+
+    def to_arrays(self, category: str) -> Dict[str, np.ndarray]:
+        """Flatten the table into named arrays for the snapshot file"""
+        return {
+            f'{category}.min_msrp': self.min_msrp,
+            f'{category}.max_msrp': self.max_msrp,
+            f'{category}.prices': self.prices,
+            f'{category}.msrp_bands': np.array(self.msrp_bands, dtype=np.str_),
+            f'{category}.includes_adh': np.array(self.includes_adh)
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, category: str) -> 'PricingTable':
+        return cls(
+            min_msrp=arrays[f'{category}.min_msrp'],
+            max_msrp=arrays[f'{category}.max_msrp'],
+            prices=arrays[f'{category}.prices'],
+            msrp_bands=arrays[f'{category}.msrp_bands'].tolist(),
+            includes_adh=bool(arrays[f'{category}.includes_adh'])
+        )
+
+
 class PricingService:
-    def __init__(self):
-        self.pricing_data = {}
-        self.load_pricing_data()
-    
-    def load_pricing_data(self):
-        """Load pricing data from the AIG Excel file"""
+    """Warranty pricing from the AIG workbook.
+
+    Nothing is read at construction: the pricing tables load on first use from
+    a compiled .npz snapshot next to the workbook. The workbook itself is only
+    parsed (and pandas imported) when the snapshot is missing or was built
+    from a workbook with a different hash.
+    """
+
+    def __init__(self, workbook_path: Optional[Path] = None, snapshot_path: Optional[Path] = None):
+        self.workbook_path = Path(workbook_path or PRICING_WORKBOOK_PATH)
+        self.snapshot_path = Path(snapshot_path or PRICING_SNAPSHOT_PATH)
+        self._pricing_tables: Optional[Dict[str, PricingTable]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pricing_tables(self) -> Dict[str, PricingTable]:
+        if self._pricing_tables is None:
+            with self._lock:
+                if self._pricing_tables is None:
+                    self._pricing_tables = self.load_pricing_data()
+        return self._pricing_tables
+
+    def load_pricing_data(self) -> Dict[str, PricingTable]:
+        """Load pricing tables from the snapshot, rebuilding it if the workbook changed"""
         try:
-            # Path to the Excel file
-            excel_path = Path(__file__).parent.parent / 'static' / 'aig_pricing' / 'AIG_ElectronicsPricing.xlsx'
-            
-            if not excel_path.exists():
-                logger.error(f"Pricing file not found: {excel_path}")
-                return
-            
-            # Load each worksheet as a separate pricing table
-            self.pricing_data = {
-                'consumer_electronics': pd.read_excel(excel_path, sheet_name='Consumer Electronics (includes ADH)'),
-                'desktops_laptops': pd.read_excel(excel_path, sheet_name='Desktops, Laptops (includes ADH)'),
-                'tablets': pd.read_excel(excel_path, sheet_name='Tablets (includes ADH)'),
-                'tvs': pd.read_excel(excel_path, sheet_name='TVs (does not include ADH)')
-            }
-            
-            # Clean and process each pricing table
-            for category, df in self.pricing_data.items():
-                self.pricing_data[category] = self._process_pricing_table(df, category)
-                
+            if not self.workbook_path.exists():
+                logger.error(f"Pricing file not found: {self.workbook_path}")
+                return {}
+
+            workbook_hash = self._hash_file(self.workbook_path)
+            tables = self._read_snapshot(workbook_hash)
+            if tables is not None:
+                logger.info("Pricing data loaded from snapshot")
+                return tables
+
+            tables = self._read_workbook()
+            self._write_snapshot(tables, workbook_hash)
             logger.info("Pricing data loaded successfully")
-            
+            return tables
+
         except Exception as e:
             logger.error(f"Error loading pricing data: {str(e)}")
+            return {}
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _read_snapshot(self, workbook_hash: str) -> Optional[Dict[str, PricingTable]]:
+        """Return the snapshot's tables if it was built from this workbook"""
+        if not self.snapshot_path.exists():
+            return None
+        try:
+            with np.load(self.snapshot_path, allow_pickle=False) as arrays:
+                if (int(arrays['format']) != SNAPSHOT_FORMAT
+                        or str(arrays['workbook_sha256']) != workbook_hash):
+                    logger.info("Pricing snapshot is stale, rebuilding from workbook")
+                    return None
+                return {
+                    str(category): PricingTable.from_arrays(arrays, str(category))
+                    for category in arrays['categories']
+                }
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable pricing snapshot {self.snapshot_path}: {str(e)}")
+            return None
+
+    def _read_workbook(self) -> Dict[str, PricingTable]:
+        """Parse every pricing worksheet in a single pass over the workbook"""
+        import pandas as pd
+
+        sheets = pd.read_excel(self.workbook_path, sheet_name=list(PRICING_SHEETS.values()))
+
+        tables = {}
+        for category, sheet_name in PRICING_SHEETS.items():
+            df = self._process_pricing_table(sheets[sheet_name], category)
+            if df.empty:
+                logger.error(f"Empty pricing data for category: {category}")
+                continue
+            missing_columns = [f'{term}-year Price' for term in PRICING_TERMS
+                               if f'{term}-year Price' not in df.columns]
+            if missing_columns:
+                logger.error(f"Missing required columns in {category}: {missing_columns}")
+            # Compile each table into sorted arrays for searchsorted lookups
+            tables[category] = PricingTable.from_dataframe(df, category)
+        return tables
+
+    def _write_snapshot(self, tables: Dict[str, PricingTable], workbook_hash: str):
+        """Atomically replace the snapshot; a read-only filesystem only costs the next cold start"""
+        arrays = {
+            'format': np.array(SNAPSHOT_FORMAT),
+            'workbook_sha256': np.array(workbook_hash),
+            'categories': np.array(list(tables), dtype=np.str_)
+        }
+        for category, table in tables.items():
+            arrays.update(table.to_arrays(category))
+
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_path.parent, suffix='.npz.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.snapshot_path)
+            logger.info(f"Pricing snapshot written: {self.snapshot_path}")
+        except OSError as e:
+            logger.warning(f"Could not write pricing snapshot {self.snapshot_path}: {str(e)}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
     
-    def _process_pricing_table(self, df: pd.DataFrame, category: str) -> pd.DataFrame:
+    def _process_pricing_table(self, df: 'pd.DataFrame', category: str) -> 'pd.DataFrame':
         """Process and clean a pricing table"""
+        import pandas as pd
+
         try:
             # Remove any empty rows and clean column names
             df = df.dropna(subset=['MSRP Band']).copy()
@@ -66,7 +231,7 @@ class PricingService:
     def _extract_min_msrp(self, band_str: str) -> float:
         """Extract minimum MSRP from band string like '$50–$99.99'"""
         try:
-            if pd.isna(band_str):
+            if band_str is None or band_str != band_str:
                 return 0.0
             
             # Remove currency symbols and split by dash
@@ -84,7 +249,7 @@ class PricingService:
     def _extract_max_msrp(self, band_str: str) -> float:
         """Extract maximum MSRP from band string like '$50–$99.99'"""
         try:
-            if pd.isna(band_str):
+            if band_str is None or band_str != band_str:
                 return float('inf')
             
             # Remove currency symbols and split by dash
@@ -102,76 +267,63 @@ class PricingService:
     def get_product_category(self, product_info: Dict) -> str:
         """Determine product category based on product information"""
         try:
-            title = product_info.get('title', '').lower()
-            vendor = product_info.get('vendor', '').lower()
-            product_type = product_info.get('product_type', '').lower()
-            
-            # Check for TV indicators
-            tv_keywords = ['tv', 'television', 'smart tv', 'led tv', 'oled tv', '4k tv', '8k tv']
-            if any(keyword in title for keyword in tv_keywords):
-                return 'tvs'
-            
-            # Check for tablet indicators
-            tablet_keywords = ['tablet', 'ipad', 'android tablet', 'surface']
-            if any(keyword in title for keyword in tablet_keywords):
-                return 'tablets'
-            
-            # Check for laptop/desktop indicators
-            computer_keywords = ['laptop', 'notebook', 'desktop', 'computer', 'pc', 'macbook', 'imac', 'mac pro']
-            if any(keyword in title for keyword in computer_keywords):
-                return 'desktops_laptops'
-            
-            # Default to consumer electronics
-            return 'consumer_electronics'
+            return category_classifier.classify(product_info)
             
         except Exception as e:
             logger.error(f"Error determining product category: {str(e)}")
             return 'consumer_electronics'
+
+    def classify_many(self, product_infos: Sequence[Dict]) -> List[str]:
+        """Determine product categories for many products at once"""
+        return category_classifier.classify_many(product_infos)
     
+    def price_many(self, prices: Sequence[float], categories: Union[str, Sequence[str]],
+                   terms: Union[int, Sequence[int]] = 2) -> Dict[str, np.ndarray]:
+        """Resolve warranty prices for whole arrays of products at once.
+
+        categories and terms may be scalars or sequences matching prices.
+        Returns arrays aligned with prices: 'warranty_price' (NaN where no price
+        applies) and 'band' (row index into the category's table, -1 if none).
+        """
+        prices = np.asarray(prices, dtype=np.float64).ravel()
+        count = prices.shape[0]
+        categories = np.broadcast_to(np.asarray(categories, dtype=object), (count,))
+        terms = np.broadcast_to(np.asarray(terms, dtype=np.int64), (count,))
+        term_values = np.asarray(PRICING_TERMS, dtype=np.int64)
+
+        warranty_prices = np.full(count, np.nan)
+        bands = np.full(count, -1, dtype=np.int64)
+
+        for category in set(categories.tolist()):
+            table = self.pricing_tables.get(category)
+            if table is None or not len(table.min_msrp):
+                continue
+
+            positions = np.flatnonzero(categories == category)
+            msrps = prices[positions]
+
+            # Last band starting at or below each MSRP, then check it still covers it
+            band = np.searchsorted(table.min_msrp, msrps, side='right') - 1
+            safe_band = np.maximum(band, 0)
+            matched = (band >= 0) & (msrps < table.max_msrp[safe_band])
+
+            column = np.searchsorted(term_values, terms[positions])
+            safe_column = np.minimum(column, len(term_values) - 1)
+            known_term = term_values[safe_column] == terms[positions]
+
+            bands[positions] = np.where(matched, band, -1)
+            warranty_prices[positions] = np.where(
+                matched & known_term, table.prices[safe_band, safe_column], np.nan
+            )
+
+        return {'warranty_price': warranty_prices, 'band': bands}
+
     def get_warranty_pricing(self, product_info: Dict, term_years: int = 2) -> Optional[Dict]:
         """Get warranty pricing for a product based on its category and MSRP"""
         try:
             msrp = float(product_info.get('price', 0))
             category = self.get_product_category(product_info)
-            
-            if category not in self.pricing_data:
-                logger.error(f"Unknown product category: {category}")
-                return None
-            
-            pricing_table = self.pricing_data[category]
-            
-            # Find the appropriate pricing band
-            matching_row = pricing_table[
-                (pricing_table['min_msrp'] <= msrp) & 
-                (pricing_table['max_msrp'] > msrp)
-            ]
-            
-            if matching_row.empty:
-                logger.warning(f"No pricing band found for MSRP ${msrp} in category {category}")
-                return None
-            
-            row = matching_row.iloc[0]
-            
-            # Get the price for the specified term
-            price_column = f'{term_years}-year Price'
-            if price_column not in row:
-                logger.error(f"Price column '{price_column}' not found")
-                return None
-            
-            warranty_price = row[price_column]
-            
-            if pd.isna(warranty_price):
-                logger.error(f"No price found for {term_years}-year warranty")
-                return None
-            
-            return {
-                'warranty_price': float(warranty_price),
-                'category': category,
-                'msrp_band': row['MSRP Band'],
-                'term_years': term_years,
-                'includes_adh': 'ADH' in row.get('category', ''),
-                'product_msrp': msrp
-            }
+            return self._quote_terms(msrp, category, [term_years]).get(term_years)
             
         except Exception as e:
             logger.error(f"Error getting warranty pricing: {str(e)}")
@@ -180,34 +332,63 @@ class PricingService:
     def get_available_terms(self, product_info: Dict) -> Dict:
         """Get available warranty terms and pricing for a product"""
         try:
-            result = {}
-            
-            # Check for 2-year and 3-year options
-            for term in [2, 3]:
-                pricing = self.get_warranty_pricing(product_info, term)
-                if pricing:
-                    result[f'{term}_year'] = pricing
-            
-            return result
+            msrp = float(product_info.get('price', 0))
+            category = self.get_product_category(product_info)
+
+            # Check for 2-year and 3-year options in a single lookup
+            quotes = self._quote_terms(msrp, category, list(PRICING_TERMS))
+            return {f'{term}_year': pricing for term, pricing in quotes.items()}
             
         except Exception as e:
             logger.error(f"Error getting available terms: {str(e)}")
             return {}
+
+    def _quote_terms(self, msrp: float, category: str, terms: List[int]) -> Dict[int, Dict]:
+        """Price one product for several terms, keyed by term"""
+        if category not in self.pricing_tables:
+            logger.error(f"Unknown product category: {category}")
+            return {}
+
+        table = self.pricing_tables[category]
+        result = self.price_many([msrp] * len(terms), category, terms)
+
+        quotes = {}
+        for term, band, warranty_price in zip(terms, result['band'], result['warranty_price']):
+            if band < 0:
+                logger.warning(f"No pricing band found for MSRP ${msrp} in category {category}")
+                continue
+
+            if np.isnan(warranty_price):
+                logger.error(f"No price found for {term}-year warranty")
+                continue
+
+            quotes[term] = {
+                'warranty_price': float(warranty_price),
+                'category': category,
+                'msrp_band': table.msrp_bands[band],
+                'term_years': term,
+                'includes_adh': table.includes_adh,
+                'product_msrp': msrp
+            }
+
+        return quotes
     
     def validate_pricing_data(self) -> bool:
         """Validate that pricing data is loaded correctly"""
         try:
-            if not self.pricing_data:
+            if not self.pricing_tables:
                 logger.error("No pricing data loaded")
                 return False
             
-            for category, df in self.pricing_data.items():
-                if df.empty:
+            for category in PRICING_SHEETS:
+                table = self.pricing_tables.get(category)
+                if table is None or not len(table.min_msrp):
                     logger.error(f"Empty pricing data for category: {category}")
                     return False
                 
-                required_columns = ['MSRP Band', '2-year Price', '3-year Price']
-                missing_columns = [col for col in required_columns if col not in df.columns]
+                # Missing price columns compile to all-NaN columns
+                missing_columns = [f'{term}-year Price' for term, column in zip(PRICING_TERMS, table.prices.T)
+                                   if np.isnan(column).all()]
                 
                 if missing_columns:
                     logger.error(f"Missing required columns in {category}: {missing_columns}")
@@ -220,5 +401,5 @@ class PricingService:
             logger.error(f"Error validating pricing data: {str(e)}")
             return False
 
-# Global pricing service instance
-pricing_service = PricingService() 
\ No newline at end of file
+# Global pricing service instance; tables load on first lookup
+pricing_service = PricingService()
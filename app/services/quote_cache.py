@@ -0,0 +1,77 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Optional
+
+from ..config import Config
+
+CachedQuote = namedtuple('CachedQuote', ['etag', 'payload', 'expires_at'])
+
+
+class QuoteCache:
+    """Per-worker cache of resolved pricing quotes.
+
+    Entries are keyed on the resolved pricing band rather than the raw price,
+    so every price falling in one band shares an entry. The key also holds the
+    band-set version, the shop domain and a digest of the shop's credentials, so
+    a new band set or a wrong API key never hits a cached quote. Callers check
+    the key against the shop cache before serving an entry, and routes that
+    change a shop's key or variant drop its entries with invalidate_shop; other
+    entries expire after PRICING_QUOTE_CACHE_TTL seconds.
+    """
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl = Config.PRICING_QUOTE_CACHE_TTL if ttl is None else ttl
+        self.max_entries = Config.PRICING_QUOTE_CACHE_SIZE if max_entries is None else max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(band_version, shop_domain, api_key, product_category, band_id):
+        credentials = hashlib.sha256(f'{shop_domain}\0{api_key}'.encode('utf-8')).hexdigest()
+        return (band_version, shop_domain, credentials, product_category, band_id)
+
+    def get(self, key) -> Optional[CachedQuote]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, variant_id, payload) -> CachedQuote:
+        """Store a quote payload and return it with its ETag.
+
+        The ETag covers the shared payload only; responses add their
+        session_token and as_of to it (see pricing_response_etag).
+        """
+        band_version, _, _, product_category, band_id = key
+        etag = hashlib.sha1(
+            f'{band_version}:{band_id}:{variant_id}:{product_category}'.encode('utf-8')
+        ).hexdigest()[:20]
+        entry = CachedQuote(etag, payload, time.monotonic() + self.ttl)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate_shop(self, shop_domain: str):
+        """Drop every quote cached for a shop, e.g. after its API key changed"""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == shop_domain]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Global per-worker quote cache
+quote_cache = QuoteCache()
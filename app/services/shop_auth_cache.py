@@ -0,0 +1,103 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Optional
+
+from ..config import Config
+
+CachedShop = namedtuple('CachedShop', ['id', 'shop_url', 'variant_id', 'key_digest', 'expires_at'])
+
+
+def hash_api_key(api_key: str) -> bytes:
+    return hashlib.sha256(api_key.encode('utf-8')).digest()
+
+
+class ShopAuthCache:
+    """Per-worker TTL/LRU cache of shop domain -> (shop id, variant id, hashed API key).
+
+    Only a SHA-256 digest of the key is held, and keys are checked with a
+    constant-time digest comparison. Routes that change a shop's key or remove
+    the shop invalidate its entry. A key that doesn't match the cached digest
+    is re-checked against the database, at most once per
+    SHOP_AUTH_RECHECK_INTERVAL per shop, so a key rotated on another worker
+    works (and the old one stops working) on the next request here.
+    """
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: Optional[int] = None,
+                 recheck_interval: Optional[float] = None):
+        self.ttl = Config.SHOP_AUTH_CACHE_TTL if ttl is None else ttl
+        self.max_entries = Config.SHOP_AUTH_CACHE_SIZE if max_entries is None else max_entries
+        self.recheck_interval = Config.SHOP_AUTH_RECHECK_INTERVAL if recheck_interval is None else recheck_interval
+        self._entries = OrderedDict()
+        self._rechecked_at = OrderedDict()  # shop domain -> monotonic time of the last mismatch re-read
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rechecks = 0
+
+    def get(self, shop_domain: str) -> Optional[CachedShop]:
+        with self._lock:
+            entry = self._entries.get(shop_domain)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self._entries[shop_domain]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(shop_domain)
+            self.hits += 1
+            return entry
+
+    def put(self, shop_domain: str, shop_id: int, shop_url: str, variant_id, api_key: str) -> CachedShop:
+        entry = CachedShop(shop_id, shop_url, variant_id, hash_api_key(api_key), time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[shop_domain] = entry
+            self._entries.move_to_end(shop_domain)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def key_matches(entry: CachedShop, provided_key: str) -> bool:
+        """Constant-time comparison of a provided key against the cached digest"""
+        return hmac.compare_digest(entry.key_digest, hash_api_key(provided_key))
+
+    def allow_recheck(self, shop_domain: str) -> bool:
+        """Whether a mismatched key may be re-checked against the database now; claims the slot if so"""
+        now = time.monotonic()
+        with self._lock:
+            last = self._rechecked_at.get(shop_domain)
+            if last is not None and now - last < self.recheck_interval:
+                return False
+            self._rechecked_at[shop_domain] = now
+            self._rechecked_at.move_to_end(shop_domain)
+            while len(self._rechecked_at) > self.max_entries:
+                self._rechecked_at.popitem(last=False)
+            self.rechecks += 1
+            return True
+
+    def invalidate(self, shop_domain: str):
+        with self._lock:
+            self._entries.pop(shop_domain, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rechecked_at.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'rechecks': self.rechecks,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl
+            }
+
+
+# Global per-worker shop auth cache
+shop_auth_cache = ShopAuthCache()
@@ -8,24 +8,6 @@
     const API_BASE_URL = 'https://flex-warranty-api.fly.dev';
     const SESSION_TOKEN_KEY = 'flex_warranty_session';
     
-    // Product category mapping
-    const PRODUCT_CATEGORIES = {
-        'laptop': 'Desktops, Laptops',
-        'desktop': 'Desktops, Laptops',
-        'computer': 'Desktops, Laptops',
-        'tablet': 'Tablets',
-        'ipad': 'Tablets',
-        'tv': 'TVs',
-        'television': 'TVs',
-        'monitor': 'Consumer Electronics',
-        'phone': 'Consumer Electronics',
-        'smartphone': 'Consumer Electronics',
-        'camera': 'Consumer Electronics',
-        'headphones': 'Consumer Electronics',
-        'speaker': 'Consumer Electronics',
-        'gaming': 'Consumer Electronics'
-    };
-    
     // Generate or retrieve session token
     function getSessionToken() {
         let sessionToken = localStorage.getItem(SESSION_TOKEN_KEY);
@@ -36,22 +18,6 @@
         return sessionToken;
     }
     
-    // Detect product category from product info
-    function detectProductCategory(productInfo) {
-        const title = productInfo.title.toLowerCase();
-        const vendor = productInfo.vendor.toLowerCase();
-        
-        // Check for specific keywords in title and vendor
-        for (const [keyword, category] of Object.entries(PRODUCT_CATEGORIES)) {
-            if (title.includes(keyword) || vendor.includes(keyword)) {
-                return category;
-            }
-        }
-        
-        // Default to Consumer Electronics if no match found
-        return 'Consumer Electronics';
-    }
-    
     // Get current product information
     function getProductInfo() {
         // Try to get product info from Shopify's global objects
@@ -103,22 +69,21 @@
     // Get warranty pricing from API
     async function getWarrantyPricing(productInfo, sessionToken, warrantyTerm = 2) {
         try {
-            const productCategory = detectProductCategory(productInfo);
-            
-            const response = await fetch(`${API_BASE_URL}/api/pricing`, {
-                method: 'POST',
+            // GET so the browser can revalidate with If-None-Match and reuse the cached quote.
+            // The server classifies product_title and returns product_category
+            const params = new URLSearchParams({
+                session_token: sessionToken,
+                product_id: productInfo.id,
+                product_price: productInfo.price,
+                product_title: productInfo.title,
+                warranty_term: warrantyTerm
+            });
+            const response = await fetch(`${API_BASE_URL}/api/pricing?${params}`, {
+                method: 'GET',
                 headers: {
-                    'Content-Type': 'application/json',
                     'X-Shop-Domain': window.Shopify.shop,
       'X-API-Key': (window.Shopify && window.Shopify.theme && window.Shopify.theme.api_key) || ''
-                },
-                body: JSON.stringify({
-                    session_token: sessionToken,
-                    product_id: productInfo.id,
-                    product_price: productInfo.price,
-                    product_category: productCategory,
-                    warranty_term: warrantyTerm
-                })
+                }
             });
             
             if (!response.ok) {
@@ -2,6 +2,9 @@ from functools import wraps
 from flask import request, jsonify
 from sqlalchemy import text
 from ..models.database import get_db
+from ..config import Config
+from ..services.shop_auth_cache import shop_auth_cache
+import hmac
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,26 +29,13 @@ def require_auth(f):
             return jsonify({'error': 'Missing API key'}), 401
 
         try:
-            with get_db() as db:
-                result = db.execute(
-                    text('''
-                        SELECT s.id, s.shop_url, s.api_key
-                        FROM shops s
-                        WHERE s.shop_url = :shop_url
-                    '''),
-                    {'shop_url': shop_domain}
-                ).mappings().first()
-
-                if not result:
-                    return jsonify({'error': 'Shop not found'}), 404
-
-                expected_key = (result['api_key'] or '').strip()
-                if not expected_key or provided_key != expected_key:
-                    return jsonify({'error': 'Invalid API key'}), 401
-
-                # Add shop info to request context
-                request.shop_id = result['id']
-                request.shop_url = result['shop_url']
+            shop, error = resolve_shop(shop_domain, provided_key)
+            if error:
+                return error
+
+            # Add shop info to request context
+            request.shop_id = shop.id
+            request.shop_url = shop.shop_url
 
         except Exception as e:
             logger.error(f"Auth error: {str(e)}")
@@ -55,6 +45,84 @@ def require_auth(f):
 
     return decorated_function
 
+def require_admin(f):
+    """Decorator to require the ADMIN_API_TOKEN bearer token; admin routes 404 when it is unset"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not Config.ADMIN_API_TOKEN:
+            return jsonify({'error': 'Not found'}), 404
+
+        auth_header = request.headers.get('Authorization') or ''
+        provided_token = auth_header[7:].strip() if auth_header.startswith('Bearer ') else ''
+        if not hmac.compare_digest(provided_token.encode('utf-8'), Config.ADMIN_API_TOKEN.encode('utf-8')):
+            return jsonify({'error': 'Invalid admin token'}), 401
+
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+# Everything require_auth and the pricing endpoints need from a shop, in one statement
+SHOP_AUTH_QUERY = text('''
+    SELECT s.id, s.shop_url, s.variant_id, s.api_key
+    FROM shops s
+    WHERE s.shop_url = :shop_url
+''')
+
+def resolve_shop(shop_domain, provided_key):
+    """Resolve a shop by domain and check its API key.
+
+    Served from the per-worker cache when possible, otherwise a single shops
+    query. Returns (shop, None) or (None, error response).
+    """
+    shop, failure = check_cached_shop(shop_domain, provided_key)
+    if shop is None and failure is None:
+        with get_db(readonly=True, replica=False) as db:
+            result = db.execute(SHOP_AUTH_QUERY, {'shop_url': shop_domain}).mappings().first()
+        shop, failure = check_shop_row(shop_domain, provided_key, result)
+
+    if failure:
+        message, status = failure
+        return None, (jsonify({'error': message}), status)
+    return shop, None
+
+def check_cached_shop(shop_domain, provided_key):
+    """Check a key against the shop cache: (shop, None), (None, failure) or (None, None) on a miss.
+
+    A key that doesn't match the cached digest is a miss too, so the caller
+    re-reads the shop and picks up a key rotated on another worker. Those
+    re-reads are rate-limited per shop; over the limit the key is rejected
+    from the cache.
+    """
+    shop = shop_auth_cache.get(shop_domain)
+    if shop is None:
+        return None, None
+    if not shop_auth_cache.key_matches(shop, provided_key):
+        if shop_auth_cache.allow_recheck(shop_domain):
+            return None, None
+        return None, ('Invalid API key', 401)
+    return shop, None
+
+def check_shop_row(shop_domain, provided_key, result):
+    """Check a key against a SHOP_AUTH_QUERY row and refresh the shop's cache entry from it.
+
+    Returns (shop, None) or (None, (error message, HTTP status)).
+    """
+    if not result:
+        shop_auth_cache.invalidate(shop_domain)
+        return None, ('Shop not found', 404)
+
+    expected_key = (result['api_key'] or '').strip()
+    if not expected_key:
+        shop_auth_cache.invalidate(shop_domain)
+        return None, ('Invalid API key', 401)
+
+    # Cached whether or not the key matches: the row is current, so a key
+    # revoked elsewhere stops matching here too
+    shop = shop_auth_cache.put(shop_domain, result['id'], result['shop_url'], result['variant_id'], expected_key)
+    if not hmac.compare_digest(provided_key.encode('utf-8'), expected_key.encode('utf-8')):
+        return None, ('Invalid API key', 401)
+    return shop, None
+
 def get_shop_context():
     """Helper function to get current shop context"""
     return {
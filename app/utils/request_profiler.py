@@ -0,0 +1,140 @@
+import hmac
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+
+class RequestProfile:
+    """Timings collected for one request: SQL statements, Shopify calls and JSON serialization"""
+
+    def __init__(self, log: bool):
+        self.started = time.perf_counter()
+        self.log = log
+        self.durations = Counter()  # span name -> ms
+        self.counts = Counter()     # span name -> calls
+        self.statements = Counter()
+
+    def add(self, name: str, duration_ms: float):
+        self.durations[name] += duration_ms
+        self.counts[name] += 1
+
+    def server_timing(self, total_ms: float) -> str:
+        metrics = []
+        for name, unit in (('db', 'statements'), ('shopify', 'calls'), ('serialize', None)):
+            if self.counts[name]:
+                metric = f'{name};dur={self.durations[name]:.2f}'
+                metrics.append(f'{metric};desc="{self.counts[name]} {unit}"' if unit else metric)
+        metrics.append(f'total;dur={total_ms:.2f}')
+        return ', '.join(metrics)
+
+    def summary(self, total_ms: float) -> dict:
+        repeated, repeats = self.statements.most_common(1)[0] if self.statements else (None, 0)
+        return {
+            'event': 'request_profile',
+            'method': request.method,
+            'endpoint': request.endpoint or request.path,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(self.durations['db'], 2),
+            'db_statements': self.counts['db'],
+            'db_distinct_statements': len(self.statements),
+            # The same statement issued over and over is the N+1 signature
+            'db_most_repeated': {'count': repeats, 'statement': repeated[:200]} if repeats > 1 else None,
+            'shopify_ms': round(self.durations['shopify'], 2),
+            'shopify_calls': self.counts['shopify'],
+            'serialize_ms': round(self.durations['serialize'], 2)
+        }
+
+
+def current_profile():
+    return g.get('_request_profile') if has_request_context() else None
+
+
+@contextmanager
+def profile_span(name: str):
+    """Time a block (e.g. a Shopify API call) into the current request's profile"""
+    profile = current_profile()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.add(name, (time.perf_counter() - started) * 1000)
+
+
+class ProfilingJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that records jsonify serialization time"""
+
+    def dumps(self, obj, **kwargs):
+        with profile_span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+def _requested_by_header() -> bool:
+    token = request.headers.get(PROFILE_HEADER)
+    return bool(token and Config.ADMIN_API_TOKEN and
+                hmac.compare_digest(token.encode('utf-8'), Config.ADMIN_API_TOKEN.encode('utf-8')))
+
+
+def _start_profile():
+    by_header = _requested_by_header()
+    if Config.REQUEST_PROFILING or by_header:
+        log = by_header or random.random() < Config.REQUEST_PROFILING_SAMPLE_RATE
+        g._request_profile = RequestProfile(log)
+
+
+def _finish_profile(response):
+    profile = g.pop('_request_profile', None)
+    if profile is None:
+        return response
+
+    total_ms = (time.perf_counter() - profile.started) * 1000
+    response.headers['Server-Timing'] = profile.server_timing(total_ms)
+    if profile.log:
+        summary = profile.summary(total_ms)
+        summary['status'] = response.status_code
+        logger.info(json.dumps(summary))
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile() is not None:
+        conn.info['_profile_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    started = conn.info.pop('_profile_started', None)
+    if profile is not None and started is not None:
+        profile.add('db', (time.perf_counter() - started) * 1000)
+        profile.statements[statement] += 1
+
+
+def init_request_profiler(app):
+    """Profile requests when REQUEST_PROFILING is on, or for a request carrying
+    X-Profile-Token: <ADMIN_API_TOKEN>.
+
+    Profiled responses get a Server-Timing header (db, shopify, serialize,
+    total). A REQUEST_PROFILING_SAMPLE_RATE share of them, and every
+    header-triggered one, is also logged as a JSON request_profile line.
+    """
+    app.json = ProfilingJSONProvider(app)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
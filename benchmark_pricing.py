@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Pricing Hot-Path Benchmarks
+Seeds a local SQLite (default) or Postgres stand-in with the AIG pricing bands and
+measures the pricing service functions, require_auth and the pricing endpoints
+through the Flask test client. Results are written as JSON so runs can be compared.
+
+Usage:
+    python benchmark_pricing.py
+    python benchmark_pricing.py --iterations 5000 --output bench_after.json --compare bench_before.json
+    python benchmark_pricing.py --database-url postgresql://localhost/flex_bench
+
+Only point --database-url at a disposable database: the benchmark creates the
+schema and seeds a benchmark shop and the AIG bands into it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# A placeholder: the app creates its engines lazily, and main() binds every
+# get_db() session to the stand-in with Session.configure(bind=engine), so this
+# URL is never connected to. Set before the app is imported so a DATABASE_URL
+# from .env can't be picked up by anything that does reach get_engine()
+os.environ['DATABASE_URL'] = 'postgresql://benchmark@localhost/benchmark'
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from app import create_app
+from app.models import database
+from app.utils.auth import require_auth, get_shop_context
+from app.services.band_index import band_index
+from app.services.quote_cache import quote_cache
+from app.services.pricing_service import pricing_service
+from app.routes.offers import get_all_warranty_pricing_options, get_many_warranty_pricing_options
+
+EXCEL_FILE = "app/static/aig_pricing/AIG_ElectronicsPricing.xlsx"
+
+# Workbook sheet -> product category, as loaded by ingest_aig_pricing.py
+SHEET_CATEGORIES = [
+    ("Consumer Electronics", "Consumer Electronics", True),
+    ("Desktops, Laptops", "Desktops, Laptops", True),
+    ("Tablets", "Tablets", True),
+    ("TVs", "TVs", False)
+]
+
+SHOP_URL = "benchmark.myshopify.com"
+API_KEY = "fw_benchmark"
+BATCH_SIZE = 50
+
+
+def parse_msrp_band(msrp_band):
+    """Parse '$50-$99.99' (hyphen or en dash) into (min, max)"""
+    clean = str(msrp_band).replace('$', '').replace(',', '').replace('–', '-').strip()
+    parts = clean.split('-')
+    if len(parts) != 2:
+        return None, None
+    try:
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        return None, None
+
+
+def load_workbook_bands():
+    """Read the AIG bands from the workbook: {category: [(min, max, price_2, price_3)]}"""
+    sheets = pd.read_excel(EXCEL_FILE, sheet_name=[sheet for sheet, _, _ in SHEET_CATEGORIES], header=2)
+    bands = {}
+    for sheet, category, _ in SHEET_CATEGORIES:
+        rows = []
+        for _, row in sheets[sheet].iterrows():
+            msrp_min, msrp_max = parse_msrp_band(row.iloc[0])
+            price_2_year, price_3_year = row.iloc[3], row.iloc[5]
+            if msrp_min is None or pd.isna(price_2_year) or pd.isna(price_3_year):
+                continue
+            rows.append((msrp_min, msrp_max, float(price_2_year), float(price_3_year)))
+        bands[category] = rows
+    return bands
+
+
+def seed_database(engine, bands):
+    """Create the schema and seed the benchmark shop and AIG bands"""
+    database.Base.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        existing = conn.execute(text("SELECT COUNT(*) FROM warranty_pricing_bands")).scalar()
+        if existing:
+            print("❌ Refusing to seed a database that already has pricing bands")
+            sys.exit(1)
+
+        shop_id = conn.execute(
+            text("""
+                INSERT INTO shops (shop_url, api_key, variant_id, created_at, updated_at)
+                VALUES (:shop_url, :api_key, '1234567890', :now, :now)
+                RETURNING id
+            """),
+            {"shop_url": SHOP_URL, "api_key": API_KEY, "now": datetime.utcnow()}
+        ).scalar()
+
+        for _, category, includes_adh in SHEET_CATEGORIES:
+            product_id = conn.execute(
+                text("""
+                    INSERT INTO warranty_insurance_products (insurer_name, product_category, includes_adh, is_active)
+                    VALUES ('AIG', :category, :includes_adh, true)
+                    RETURNING id
+                """),
+                {"category": category, "includes_adh": includes_adh}
+            ).scalar()
+
+            conn.execute(
+                text("""
+                    INSERT INTO warranty_pricing_bands
+                    (insurance_product_id, msrp_min, msrp_max, price_2_year, price_3_year, effective_date)
+                    VALUES (:product_id, :msrp_min, :msrp_max, :price_2_year, :price_3_year, :now)
+                """),
+                [
+                    {"product_id": product_id, "msrp_min": msrp_min, "msrp_max": msrp_max,
+                     "price_2_year": price_2_year, "price_3_year": price_3_year, "now": datetime.utcnow()}
+                    for msrp_min, msrp_max, price_2_year, price_3_year in bands[category]
+                ]
+            )
+
+
+def measure(name, fn, iterations, warmup):
+    """Time fn() per call and summarise latency percentiles and throughput"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - call_started)
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+
+    def percentile(p):
+        # Nearest-rank percentile
+        return samples[max(0, min(len(samples) - 1, int(round(p / 100 * len(samples))) - 1))] / 1e6
+
+    result = {
+        "iterations": iterations,
+        "p50_ms": round(percentile(50), 4),
+        "p95_ms": round(percentile(95), 4),
+        "p99_ms": round(percentile(99), 4),
+        "mean_ms": round(sum(samples) / len(samples) / 1e6, 4),
+        "ops_per_sec": round(iterations / elapsed, 1)
+    }
+    print(f"  {name:<32} p50 {result['p50_ms']:>8.3f} ms  p95 {result['p95_ms']:>8.3f} ms  "
+          f"p99 {result['p99_ms']:>8.3f} ms  {result['ops_per_sec']:>10.1f} ops/s")
+    return result
+
+
+def expect_status(response, status):
+    if response.status_code != status:
+        raise RuntimeError(f"Expected HTTP {status}, got {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+
+def run_benchmarks(client, bands, iterations, warmup):
+    rng = random.Random(42)
+    categories = list(bands)
+    headers = {"X-API-Key": API_KEY, "X-Shop-Domain": SHOP_URL}
+
+    def random_item():
+        category = rng.choice(categories)
+        msrp_min, msrp_max, _, _ = rng.choice(bands[category])
+        return {"product_id": str(rng.randint(1, 10 ** 6)), "product_category": category,
+                "product_price": round(rng.uniform(msrp_min, msrp_max), 2)}
+
+    results = {}
+    print("\n📊 Service functions")
+
+    def band_lookup():
+        item = random_item()
+        band_index.lookup(item["product_category"], item["product_price"])
+    results["band_index.lookup"] = measure("band_index.lookup", band_lookup, iterations, warmup)
+
+    def pricing_options():
+        item = random_item()
+        get_all_warranty_pricing_options(item["product_price"], item["product_category"])
+    results["get_all_warranty_pricing_options"] = measure(
+        "get_all_warranty_pricing_options", pricing_options, iterations, warmup)
+
+    def many_pricing_options():
+        get_many_warranty_pricing_options([random_item() for _ in range(BATCH_SIZE)])
+    results["get_many_warranty_pricing_options"] = measure(
+        f"get_many_..._options x{BATCH_SIZE}", many_pricing_options, iterations, warmup)
+
+    if pricing_service.validate_pricing_data():
+        def service_terms():
+            pricing_service.get_available_terms({"price": rng.uniform(25, 4999), "title": "Samsung 55in TV"})
+        results["PricingService.get_available_terms"] = measure(
+            "PricingService.get_available_terms", service_terms, iterations, warmup)
+    else:
+        print("  PricingService                   skipped: workbook layout not recognised by PricingService")
+
+    print("\n🌐 Endpoints (Flask test client)")
+
+    def auth():
+        expect_status(client.get("/bench/auth", headers=headers), 200)
+    results["require_auth"] = measure("require_auth", auth, iterations, warmup)
+
+    def single_uncached():
+        quote_cache.clear()
+        expect_status(client.post("/api/pricing", json={"session_token": "bench", **random_item()},
+                                  headers=headers), 200)
+    results["POST /api/pricing uncached"] = measure("POST /api/pricing uncached", single_uncached, iterations, warmup)
+
+    cached_item = random_item()
+
+    def single_cached():
+        expect_status(client.post("/api/pricing", json={"session_token": "bench", **cached_item},
+                                  headers=headers), 200)
+    results["POST /api/pricing cached"] = measure("POST /api/pricing cached", single_cached, iterations, warmup)
+
+    etag = client.get("/api/pricing", query_string={"session_token": "bench", **cached_item},
+                      headers=headers).headers["ETag"]
+
+    def conditional_get():
+        expect_status(client.get("/api/pricing", query_string={"session_token": "bench", **cached_item},
+                                 headers={**headers, "If-None-Match": etag}), 304)
+    results["GET /api/pricing 304"] = measure("GET /api/pricing 304", conditional_get, iterations, warmup)
+
+    def batch():
+        expect_status(client.post("/api/pricing/batch", json={
+            "session_token": "bench", "items": [random_item() for _ in range(BATCH_SIZE)]
+        }, headers=headers), 200)
+    results["POST /api/pricing/batch"] = measure(f"POST /api/pricing/batch x{BATCH_SIZE}", batch, iterations, warmup)
+
+    return results
+
+
+def compare(results, baseline_path):
+    """Print p50/p95 changes against a previous results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    print(f"\n🔍 Compared with {baseline_path}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            print(f"  {name:<40} (new)")
+            continue
+        changes = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if previous[metric]:
+                changes.append(f"{metric[:3]} {100 * (current[metric] - previous[metric]) / previous[metric]:+6.1f}%")
+        print(f"  {name:<40} {'  '.join(changes)}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pricing hot path")
+    parser.add_argument("--database-url", help="Disposable stand-in database (default: temporary SQLite file)")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='flex-bench-'), 'bench.db')}"
+
+    print("Starting pricing benchmarks...")
+    print(f"🔗 Stand-in database: {database_url.split('@')[-1]}")
+
+    engine = create_engine(database_url)
+    bands = load_workbook_bands()
+    seed_database(engine, bands)
+    print(f"✅ Seeded {sum(len(rows) for rows in bands.values())} AIG bands in {len(bands)} categories")
+
+    # Route every get_db() session to the stand-in
+    database.Session.configure(bind=engine)
+
+    app = create_app()
+
+    # A bare authenticated route, so require_auth is measured on its own
+    @app.route('/bench/auth')
+    @require_auth
+    def bench_auth():
+        return get_shop_context(), 200
+
+    results = run_benchmarks(app.test_client(), bands, args.iterations, args.warmup)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "batch_size": BATCH_SIZE
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
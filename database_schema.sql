@@ -47,7 +47,8 @@ CREATE TABLE IF NOT EXISTS offer_layouts (
     description TEXT,
     css_classes TEXT,
     preview_html TEXT,
-    created_at TIMESTAMP DEFAULT now()
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
 );
 
 -- Create offers table
@@ -60,16 +61,19 @@ CREATE TABLE IF NOT EXISTS offers (
     button_text VARCHAR(255),
     button_url TEXT,
     theme JSONB,
+    theme_id INTEGER, -- offer_themes id referenced by theme->'id'
     layout_id INTEGER REFERENCES offer_layouts(id),
     status VARCHAR(50) DEFAULT 'active',
-    created_at TIMESTAMP DEFAULT now(),
+    created_at TIMESTAMP NOT NULL DEFAULT now(), -- keyset pagination anchors on it
     updated_at TIMESTAMP DEFAULT now()
 );
 
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_shops_shop_url ON shops(shop_url);
 CREATE INDEX IF NOT EXISTS idx_offers_shop_id ON offers(shop_id);
+CREATE INDEX IF NOT EXISTS idx_offers_shop_created_id ON offers(shop_id, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_offers_status ON offers(status);
+CREATE INDEX IF NOT EXISTS idx_offers_shop_theme_id ON offers(shop_id, theme_id);
 CREATE INDEX IF NOT EXISTS idx_offer_themes_shop_id ON offer_themes(shop_id);
 CREATE INDEX IF NOT EXISTS idx_offer_layouts_shop_id ON offer_layouts(shop_id);
 CREATE INDEX IF NOT EXISTS idx_shop_settings_shop_id ON shop_settings(shop_id);
@@ -93,6 +97,9 @@ CREATE TRIGGER update_shop_settings_updated_at BEFORE UPDATE ON shop_settings
 CREATE TRIGGER update_offers_updated_at BEFORE UPDATE ON offers
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+CREATE TRIGGER update_offer_layouts_updated_at BEFORE UPDATE ON offer_layouts
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 -- Create a function to insert default layouts and themes for a new shop
 CREATE OR REPLACE FUNCTION insert_default_layouts_and_themes(shop_id INTEGER)
 RETURNS VOID AS $$
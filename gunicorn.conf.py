@@ -0,0 +1,109 @@
+# Gunicorn configuration, read automatically from the working directory
+#
+# Sized for the Fly VM (1 shared vCPU, 512 MB) by default and scaled from the
+# CPU and memory the container actually gets. Every setting can be overridden
+# with the environment variables below.
+import gc
+import os
+
+from app.config import Config
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# Memory kept back for the master process and the preloaded app, and the
+# budget per gthread worker (about 55 MB RSS under loadtest_gunicorn.py)
+MASTER_MEMORY_MB = int(os.getenv('GUNICORN_MASTER_MEMORY_MB', '150'))
+WORKER_MEMORY_MB = int(os.getenv('GUNICORN_WORKER_MEMORY_MB', '90'))
+
+
+def _cpu_count():
+    """CPUs available to the container: cgroup v2 quota, else the affinity mask"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+
+def _memory_mb():
+    """Memory available to the container: cgroup v2 or v1 limit, else physical memory"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != 'max' and int(value) < 1 << 50:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (OSError, ValueError):
+        return 512
+
+
+cpus = _cpu_count()
+memory_mb = int(os.getenv('GUNICORN_MEMORY_MB', '0')) or _memory_mb()
+
+# Threads, not processes, cover waiting on Postgres and Shopify: two workers
+# per CPU, as many as the memory budget allows
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', '0')) or max(
+    1, min(2 * cpus, (memory_mb - MASTER_MEMORY_MB) // WORKER_MEMORY_MB)
+)
+# No more threads than a worker's pool can serve without queueing on checkout
+threads = int(os.getenv('GUNICORN_THREADS', '0')) or max(
+    1, min(4, Config.DB_POOL_SIZE + Config.DB_MAX_OVERFLOW)
+)
+
+# Import the app once in the master and fork workers from it; database engines
+# are created lazily, so no pool exists yet when the workers are forked
+preload_app = True
+
+# Fly's proxy reuses connections to the app; keep them open between requests
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '30'))
+
+# Recycle workers now and then, staggered so they don't all restart together.
+# Each recycle drops its idle keep-alive connections, so keep it infrequent
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '20'))
+
+# Heartbeat files on tmpfs; the container's overlay filesystem can stall them
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def when_ready(server):
+    """Load the read-only pricing tables in the master so workers share them copy-on-write"""
+    from app.models.database import dispose_engines
+    from app.services.band_index import band_index, band_history_index
+
+    try:
+        for index in (band_index, band_history_index):
+            index.refresh()
+        server.log.info(f"Pricing tables preloaded: band index {band_index.version}")
+    except Exception as e:
+        # Workers load the tables on first use instead
+        server.log.warning(f"Pricing table preload failed: {str(e)}")
+    finally:
+        # The master never serves requests; don't keep its connections open
+        dispose_engines()
+
+    # Keep the preloaded objects out of the collector, so a collection in a
+    # worker doesn't write to (and un-share) their pages
+    gc.freeze()
+    server.log.info(f"{workers} {worker_class} workers x {threads} threads "
+                    f"({cpus} CPU, {memory_mb} MB)")
+
+
+def post_fork(server, worker):
+    """Give each worker its own connection pools and open them before it serves"""
+    from app.models.database import reset_engines_after_fork, warm_pools
+
+    reset_engines_after_fork()
+    warm_pools()
+    server.log.info(f"Worker {worker.pid}: database pools warmed")
@@ -2,13 +2,17 @@
 """
 AIG Pricing Data Ingestion Script
 Reads the AIG_ElectronicsPricing.xlsx file and ingests pricing data into the database.
+The whole workbook is staged with one bulk insert and swapped in atomically, in a
+single transaction, so live pricing never sees an empty band set.
 """
 
 import pandas as pd
 import os
 import sys
+import time
 from datetime import datetime
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -32,93 +36,104 @@ def connect_to_database():
         print(f"Error connecting to database: {e}")
         sys.exit(1)
 
-def get_insurance_product_id(engine, insurer_name, product_category):
-    """Get insurance product ID from database"""
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(
-                text("""
-                    SELECT id FROM warranty_insurance_products 
-                    WHERE insurer_name = :insurer_name 
-                    AND product_category = :product_category
-                    AND is_active = true
-                """),
-                {"insurer_name": insurer_name, "product_category": product_category}
-            ).fetchone()
-            
-            if result:
-                return result[0]
-            else:
-                print(f"Warning: No active insurance product found for {insurer_name} - {product_category}")
-                return None
-    except Exception as e:
-        print(f"Error getting insurance product ID: {e}")
-        return None
+def get_insurance_product_ids(conn, insurer_name):
+    """Get active insurance product IDs for an insurer, keyed by product category"""
+    rows = conn.execute(
+        text("""
+            SELECT product_category, id FROM warranty_insurance_products
+            WHERE insurer_name = :insurer_name
+            AND is_active = true
+            ORDER BY id
+        """),
+        {"insurer_name": insurer_name}
+    ).all()
 
-def deactivate_old_pricing(engine, insurance_product_id):
-    """Deactivate old pricing bands for the given insurance product"""
-    try:
-        with engine.connect() as conn:
-            conn.execute(
-                text("""
-                    UPDATE warranty_pricing_bands 
-                    SET expiry_date = now() 
-                    WHERE insurance_product_id = :product_id 
-                    AND expiry_date IS NULL
-                """),
-                {"product_id": insurance_product_id}
-            )
-            conn.commit()
-            print(f"Deactivated old pricing bands for insurance product {insurance_product_id}")
-    except Exception as e:
-        print(f"Error deactivating old pricing: {e}")
+    product_ids = {}
+    for product_category, product_id in rows:
+        # Match the API, which prices from the first active product per category
+        product_ids.setdefault(product_category, product_id)
+    return product_ids
 
-def insert_pricing_bands(engine, insurance_product_id, pricing_data):
-    """Insert new pricing bands into database"""
-    try:
-        with engine.connect() as conn:
-            for _, row in pricing_data.iterrows():
-                # Get values from unnamed columns
-                msrp_band = str(row.iloc[0])  # First column is MSRP Band
-                price_2_year = row.iloc[3]    # Fourth column is 2-year price
-                price_3_year = row.iloc[5]    # Sixth column is 3-year price
-                
-                # Skip if MSRP band is not valid
-                if pd.isna(msrp_band) or msrp_band == 'nan' or 'MSRP Band' in msrp_band:
-                    continue
-                
-                # Parse MSRP band
-                msrp_min, msrp_max = parse_msrp_band(msrp_band)
-                
-                if msrp_min is None or msrp_max is None:
-                    print(f"Warning: Could not parse MSRP band: {msrp_band}")
-                    continue
-                
-                # Skip if prices are not valid
-                if pd.isna(price_2_year) or pd.isna(price_3_year):
-                    print(f"Warning: Invalid prices for band {msrp_band}")
-                    continue
-                
-                # Insert pricing band
-                conn.execute(
-                    text("""
-                        INSERT INTO warranty_pricing_bands 
-                        (insurance_product_id, msrp_min, msrp_max, price_2_year, price_3_year, effective_date)
-                        VALUES (:product_id, :msrp_min, :msrp_max, :price_2_year, :price_3_year, now())
-                    """),
-                    {
-                        "product_id": insurance_product_id,
-                        "msrp_min": msrp_min,
-                        "msrp_max": msrp_max,
-                        "price_2_year": float(price_2_year),
-                        "price_3_year": float(price_3_year)
-                    }
-                )
-            
-            conn.commit()
-            print(f"Inserted pricing bands for insurance product {insurance_product_id}")
-    except Exception as e:
-        print(f"Error inserting pricing bands: {e}")
+def read_pricing_rows(df, insurance_product_id):
+    """Parse a sheet into pricing band rows ready for a bulk insert"""
+    rows = []
+    # Columns: MSRP Band, Service Type, monthly 2-year, 2-year, monthly 3-year, 3-year
+    for msrp_band, price_2_year, price_3_year in zip(df.iloc[:, 0], df.iloc[:, 3], df.iloc[:, 5]):
+        msrp_band = str(msrp_band)
+
+        # Skip if MSRP band is not valid
+        if pd.isna(msrp_band) or msrp_band == 'nan' or 'MSRP Band' in msrp_band:
+            continue
+
+        # Notes below the table are not bands
+        if '$' not in msrp_band:
+            continue
+
+        # Parse MSRP band
+        msrp_min, msrp_max = parse_msrp_band(msrp_band)
+
+        if msrp_min is None or msrp_max is None:
+            print(f"Warning: Could not parse MSRP band: {msrp_band}")
+            continue
+
+        # Skip if prices are not valid
+        if pd.isna(price_2_year) or pd.isna(price_3_year):
+            print(f"Warning: Invalid prices for band {msrp_band}")
+            continue
+
+        rows.append({
+            "product_id": insurance_product_id,
+            "msrp_min": msrp_min,
+            "msrp_max": msrp_max,
+            "price_2_year": float(price_2_year),
+            "price_3_year": float(price_3_year)
+        })
+    return rows
+
+def stage_pricing_bands(conn, rows):
+    """Bulk load parsed bands into a transaction-scoped staging table"""
+    conn.execute(text("""
+        CREATE TEMP TABLE staging_pricing_bands (
+            insurance_product_id INTEGER NOT NULL,
+            msrp_min DECIMAL(10,2) NOT NULL,
+            msrp_max DECIMAL(10,2) NOT NULL,
+            price_2_year DECIMAL(10,2) NOT NULL,
+            price_3_year DECIMAL(10,2) NOT NULL
+        ) ON COMMIT DROP
+    """))
+
+    # One executemany for the whole workbook
+    conn.execute(
+        text("""
+            INSERT INTO staging_pricing_bands
+            (insurance_product_id, msrp_min, msrp_max, price_2_year, price_3_year)
+            VALUES (:product_id, :msrp_min, :msrp_max, :price_2_year, :price_3_year)
+        """),
+        rows
+    )
+
+def activate_staged_pricing(conn):
+    """Swap the active bands for the staged ones.
+
+    Runs inside the ingestion transaction, so readers see either the old or the
+    new band set, never neither. now() is the transaction start time, so each
+    old band's expiry_date equals its replacement's effective_date.
+    """
+    expired = conn.execute(text("""
+        UPDATE warranty_pricing_bands
+        SET expiry_date = now()
+        WHERE expiry_date IS NULL
+        AND insurance_product_id IN (SELECT DISTINCT insurance_product_id FROM staging_pricing_bands)
+    """)).rowcount
+
+    inserted = conn.execute(text("""
+        INSERT INTO warranty_pricing_bands
+        (insurance_product_id, msrp_min, msrp_max, price_2_year, price_3_year, effective_date)
+        SELECT insurance_product_id, msrp_min, msrp_max, price_2_year, price_3_year, now()
+        FROM staging_pricing_bands
+    """)).rowcount
+
+    return expired, inserted
 
 def parse_msrp_band(msrp_band):
     """Parse MSRP band string to extract min and max values"""
@@ -149,33 +164,10 @@ def parse_msrp_band(msrp_band):
         print(f"Error parsing MSRP band '{msrp_band}': {e}")
         return None, None
 
-def process_excel_sheet(engine, sheet_name, insurer_name, product_category):
-    """Process a single Excel sheet and ingest its pricing data"""
-    print(f"\nProcessing sheet: {sheet_name}")
-    
-    try:
-        # Read Excel sheet starting from row 3 (index 2) where the actual data begins
-        df = pd.read_excel(EXCEL_FILE, sheet_name=sheet_name, header=2)
-        print(f"Found {len(df)} rows in {sheet_name}")
-        
-        # Get insurance product ID
-        insurance_product_id = get_insurance_product_id(engine, insurer_name, product_category)
-        if not insurance_product_id:
-            print(f"Skipping {sheet_name} - no insurance product found")
-            return
-        
-        # Deactivate old pricing
-        deactivate_old_pricing(engine, insurance_product_id)
-        
-        # Insert new pricing bands
-        insert_pricing_bands(engine, insurance_product_id, df)
-        
-    except Exception as e:
-        print(f"Error processing sheet {sheet_name}: {e}")
-
 def main():
     """Main ingestion function"""
     print("Starting AIG pricing data ingestion...")
+    started = time.perf_counter()
     
     # Check if Excel file exists
     if not os.path.exists(EXCEL_FILE):
@@ -194,14 +186,46 @@ def main():
         ("TVs", "AIG", "TVs")
     ]
     
-    # Process each sheet
-    for sheet_name, insurer_name, product_category in sheet_mappings:
-        try:
-            process_excel_sheet(engine, sheet_name, insurer_name, product_category)
-        except Exception as e:
-            print(f"Error processing {sheet_name}: {e}")
+    # Read every sheet in one pass; the data starts on row 3 (index 2)
+    sheets = pd.read_excel(EXCEL_FILE, sheet_name=[sheet_name for sheet_name, _, _ in sheet_mappings], header=2)
+    
+    try:
+        # One transaction: stage, expire the old bands and insert the new ones
+        with engine.begin() as conn:
+            product_ids = {}
+            for insurer_name in {insurer_name for _, insurer_name, _ in sheet_mappings}:
+                product_ids[insurer_name] = get_insurance_product_ids(conn, insurer_name)
+
+            rows = []
+            for sheet_name, insurer_name, product_category in sheet_mappings:
+                print(f"\nProcessing sheet: {sheet_name}")
+                insurance_product_id = product_ids[insurer_name].get(product_category)
+                if not insurance_product_id:
+                    print(f"Skipping {sheet_name} - no active insurance product found for {insurer_name} - {product_category}")
+                    continue
+
+                sheet_rows = read_pricing_rows(sheets[sheet_name], insurance_product_id)
+                if not sheet_rows:
+                    # Keep the current bands rather than leaving the product without pricing
+                    print(f"Skipping {sheet_name} - no valid pricing bands found")
+                    continue
+
+                print(f"Found {len(sheet_rows)} pricing bands in {sheet_name}")
+                rows.extend(sheet_rows)
+
+            if not rows:
+                print("Error: No pricing bands to ingest")
+                sys.exit(1)
+
+            stage_pricing_bands(conn, rows)
+            expired, inserted = activate_staged_pricing(conn)
+
+    except SQLAlchemyError as e:
+        print(f"Error ingesting pricing data, no changes were made: {e}")
+        sys.exit(1)
     
-    print("\nAIG pricing data ingestion completed!")
+    print(f"\nExpired {expired} old pricing bands and inserted {inserted} new ones")
+    print(f"AIG pricing data ingestion completed in {time.perf_counter() - started:.2f}s!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Gunicorn Profile Load Test
+Runs the API under gunicorn's defaults (one sync worker, no preload) and under
+gunicorn.conf.py, drives the same storefront traffic mix at both and compares
+throughput, latency and memory. The database is a seeded SQLite stand-in with
+an injected per-statement delay standing in for the Postgres round trip.
+
+Usage:
+    python loadtest_gunicorn.py
+    python loadtest_gunicorn.py --concurrency 32 --duration 30 --db-latency-ms 5 --cpus 1 --memory-mb 512
+
+--cpus pins the servers to that many CPUs with taskset and --memory-mb is the
+memory budget gunicorn.conf.py sizes the workers for, so a bigger machine can
+stand in for the 1 vCPU / 512 MB Fly VM.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+SHOP_URL = "benchmark.myshopify.com"
+API_KEY = "fw_benchmark"
+BATCH_SIZE = 20
+
+# Storefront-heavy mix: (weight, name)
+TRAFFIC_MIX = [
+    (70, "GET /api/pricing"),
+    (10, "POST /api/pricing/batch"),
+    (20, "GET /api/shops/stats")
+]
+
+
+def create_server_app():
+    """Gunicorn app factory: main.app plus the injected database latency"""
+    latency_ms = float(os.getenv("LOADTEST_DB_LATENCY_MS", "0"))
+    if latency_ms:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        @event.listens_for(Engine, "before_cursor_execute")
+        def simulate_round_trip(conn, cursor, statement, parameters, context, executemany):
+            time.sleep(latency_ms / 1000)
+
+    from main import app
+    return app
+
+
+def seed_database(path):
+    """Seed the stand-in with the benchmark shop and the AIG bands"""
+    from sqlalchemy import create_engine
+    import benchmark_pricing
+
+    bands = benchmark_pricing.load_workbook_bands()
+    engine = create_engine(f"sqlite:///{path}")
+    benchmark_pricing.seed_database(engine, bands)
+    engine.dispose()
+    return bands
+
+
+def process_tree(pid):
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def memory_mb(pid):
+    """Total RSS and PSS (shared pages split between processes) of a process tree"""
+    rss = pss = 0
+    for process in process_tree(pid):
+        try:
+            with open(f"/proc/{process}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            continue
+    return round(rss / 1024, 1), round(pss / 1024, 1)
+
+
+def start_server(profile, port, env, cpus):
+    if profile == "baseline":
+        # An empty config file, so gunicorn.conf.py in the working directory is not picked up
+        config = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False)
+        config.close()
+        config_path = config.name
+    else:
+        config_path = "gunicorn.conf.py"
+
+    command = ["gunicorn", "--config", config_path, "--bind", f"127.0.0.1:{port}",
+               "loadtest_gunicorn:create_server_app()"]
+    if cpus and shutil.which("taskset"):
+        command = ["taskset", "-c", ",".join(str(cpu) for cpu in range(cpus))] + command
+
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              start_new_session=True)
+    wait_until_healthy(port)
+    return server
+
+
+def wait_until_healthy(port, timeout=60):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become healthy")
+
+
+def stop_server(server):
+    os.killpg(server.pid, signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+
+
+def run_load(port, bands, concurrency, duration, warmup):
+    """Drive the traffic mix from concurrency keep-alive clients and collect latencies per request type"""
+    import requests
+
+    base_url = f"http://127.0.0.1:{port}"
+    headers = {"X-API-Key": API_KEY, "X-Shop-Domain": SHOP_URL}
+    categories = list(bands)
+    names = [name for _, name in TRAFFIC_MIX]
+    weights = [weight for weight, _ in TRAFFIC_MIX]
+
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def random_item(rng):
+        category = rng.choice(categories)
+        msrp_min, msrp_max, _, _ = rng.choice(bands[category])
+        return {"product_id": str(rng.randint(1, 10 ** 6)), "product_category": category,
+                "product_price": round(rng.uniform(msrp_min, msrp_max), 2)}
+
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                return
+            name = rng.choices(names, weights)[0]
+            request_started = time.perf_counter()
+            try:
+                if name == "GET /api/pricing":
+                    response = session.get(f"{base_url}/api/pricing", headers=headers,
+                                           params={"session_token": "load", **random_item(rng)}, timeout=30)
+                elif name == "POST /api/pricing/batch":
+                    response = session.post(f"{base_url}/api/pricing/batch", headers=headers, timeout=30, json={
+                        "session_token": "load", "items": [random_item(rng) for _ in range(BATCH_SIZE)]
+                    })
+                else:
+                    response = session.get(f"{base_url}/api/shops/stats", headers=headers, timeout=30)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed_ms = (time.perf_counter() - request_started) * 1000
+            if now >= measure_from:
+                with lock:
+                    if ok:
+                        samples[name].append(elapsed_ms)
+                    else:
+                        errors[name] += 1
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def summarise(values, failed):
+        values = sorted(values)
+
+        def percentile(p):
+            # Nearest-rank percentile
+            return values[max(0, min(len(values) - 1, int(round(p / 100 * len(values))) - 1))] if values else None
+
+        return {
+            "requests": len(values),
+            "errors": failed,
+            "rps": round(len(values) / duration, 1),
+            "p50_ms": round(percentile(50), 2) if values else None,
+            "p95_ms": round(percentile(95), 2) if values else None,
+            "p99_ms": round(percentile(99), 2) if values else None
+        }
+
+    results = {name: summarise(samples[name], errors[name]) for name in names}
+    results["total"] = summarise([value for name in names for value in samples[name]], sum(errors.values()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gunicorn defaults with gunicorn.conf.py under load")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=int, default=20, help="Measured seconds per profile")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Simulated Postgres round trip")
+    parser.add_argument("--cpus", type=int, default=1, help="Pin the servers to this many CPUs (0: no pinning)")
+    parser.add_argument("--memory-mb", type=int, default=512, help="Memory budget for gunicorn.conf.py sizing")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    print("Starting gunicorn load test...")
+    database_path = os.path.join(tempfile.mkdtemp(prefix="flex-load-"), "load.db")
+    bands = seed_database(database_path)
+    print(f"✅ Seeded stand-in database at {database_path}")
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "LOADTEST_DB_LATENCY_MS": str(args.db_latency_ms),
+        "GUNICORN_MEMORY_MB": str(args.memory_mb)
+    }
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "db_latency_ms": args.db_latency_ms,
+            "cpus": args.cpus,
+            "memory_mb": args.memory_mb
+        },
+        "profiles": {}
+    }
+
+    for profile in ("baseline", "tuned"):
+        print(f"\n🚀 {profile}: {'gunicorn defaults' if profile == 'baseline' else 'gunicorn.conf.py'}")
+        server = start_server(profile, args.port, env, args.cpus)
+        try:
+            idle_rss, idle_pss = memory_mb(server.pid)
+            results = run_load(args.port, bands, args.concurrency, args.duration, args.warmup)
+            loaded_rss, loaded_pss = memory_mb(server.pid)
+            processes = len(process_tree(server.pid))
+        finally:
+            stop_server(server)
+
+        results["memory"] = {"processes": processes, "idle_rss_mb": idle_rss, "idle_pss_mb": idle_pss,
+                             "loaded_rss_mb": loaded_rss, "loaded_pss_mb": loaded_pss}
+        report["profiles"][profile] = results
+
+        for name, summary in results.items():
+            if name == "memory":
+                continue
+            print(f"  {name:<26} {summary['rps']:>8.1f} req/s  p50 {summary['p50_ms'] or 0:>8.2f} ms  "
+                  f"p95 {summary['p95_ms'] or 0:>8.2f} ms  p99 {summary['p99_ms'] or 0:>8.2f} ms  "
+                  f"errors {summary['errors']}")
+        print(f"  memory: {processes} processes, PSS {loaded_pss} MB under load (RSS {loaded_rss} MB)")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+from dotenv import load_dotenv
+import logging
+
+# Only load .env locally (not on Fly)
+if not os.getenv("FLY_APP_NAME"):
+    load_dotenv()
+
+from app.asgi import create_async_app
+
+logging.basicConfig(level=logging.INFO)
+
+# Storefront pricing on the event loop, every other route through the Flask app
+app = create_async_app()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '8080')))
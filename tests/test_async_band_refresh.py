@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+from app.services.band_index import BandIndex, BandIndexUnavailable
+
+from .conftest import QUOTE_PARAMS, auth_headers
+
+
+def test_background_refreshed_index_never_reloads_inline(engine):
+    index = BandIndex(ttl=0)
+    index.background_refresh = True
+    index.refresh = lambda: pytest.fail('reloaded on the caller thread')
+
+    with pytest.raises(BandIndexUnavailable):
+        index.lookup('TVs', 300)
+
+    index.rebuild_from_rows([])
+    # Stale (ttl=0) but served as loaded; the background task reloads it
+    assert index.lookup('TVs', 300) == (None, None)
+    assert index.due_for_refresh(60) is False
+    index.invalidate()
+    assert index.due_for_refresh(60) is True
+
+
+def test_async_app_prices_on_sqlite(priced_client, engine, tmp_path, monkeypatch):
+    from starlette.testclient import TestClient
+
+    from app.asgi import create_async_app
+    from app.models import async_database
+    from app.services.band_index import band_history_index, band_index
+
+    # The async engine needs a file the sync fixture engine can share
+    database_file = tmp_path / 'async.db'
+    with engine.connect() as conn:
+        conn.connection.driver_connection.backup(sqlite3.connect(database_file))
+    monkeypatch.setattr('app.config.Config.DATABASE_URL', f'sqlite:///{database_file}')
+    for name in ('async_engine', 'async_replica_engine', 'AsyncSessionFactory', 'AsyncReplicaSessionFactory'):
+        monkeypatch.setattr(async_database, name, None)
+
+    try:
+        with TestClient(create_async_app()) as client:
+            response = client.get('/api/pricing', headers=auth_headers(), params=QUOTE_PARAMS)
+            assert response.status_code == 200
+            assert response.json()['product_category'] == 'TVs'
+            assert band_index.background_refresh
+    finally:
+        for index in (band_index, band_history_index):
+            index.background_refresh = False
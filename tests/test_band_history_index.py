@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from app.models.database import WarrantyInsuranceProduct, WarrantyPricingBand, get_db
+from app.services.band_index import BandHistoryIndex
+
+
+def test_lookup_as_of_on_sqlite(engine):
+    with get_db() as db:
+        product = WarrantyInsuranceProduct(insurer_name='AIG', product_category='TVs', includes_adh=True)
+        db.add(product)
+        db.flush()
+        db.add_all([
+            WarrantyPricingBand(insurance_product_id=product.id, msrp_min=0, msrp_max=500,
+                                price_2_year=30, price_3_year=45, effective_date=datetime(2024, 1, 1),
+                                expiry_date=datetime(2025, 1, 1)),
+            WarrantyPricingBand(insurance_product_id=product.id, msrp_min=0, msrp_max=500,
+                                price_2_year=35, price_3_year=50, effective_date=datetime(2025, 1, 1)),
+        ])
+        db.commit()
+
+    index = BandHistoryIndex()
+    _, old_band = index.lookup_as_of('TVs', 300, datetime(2024, 6, 1))
+    _, current_band = index.lookup_as_of('TVs', 300, datetime(2025, 6, 1))
+    _, no_band = index.lookup_as_of('TVs', 300, datetime(2023, 6, 1))
+
+    assert old_band.price_2_year == 30
+    assert current_band.price_2_year == 35
+    assert no_band is None
@@ -0,0 +1,34 @@
+from app.models.database import WarrantyInsuranceProduct, WarrantyPricingBand, get_db
+from app.services.band_index import BandTable, PricingBand, band_index
+
+
+def band(band_id, msrp_min, msrp_max):
+    return PricingBand(band_id, 1, msrp_min, msrp_max, 10, 20)
+
+
+def test_price_covered_only_by_an_earlier_wider_band():
+    table = BandTable([band(1, 0, 1000), band(2, 100, 200), band(3, 300, 400)])
+
+    assert table.find(250).id == 1
+    assert table.find(150).id == 2
+    assert table.find(1001) is None
+    found = table.find_many([1001, 250, 350, 50])
+    assert [match and match.id for match in found] == [None, 1, 3, 1]
+
+
+def test_overlapping_bands_from_the_database(engine):
+    with get_db() as db:
+        product = WarrantyInsuranceProduct(insurer_name='AIG', product_category='TVs', includes_adh=True)
+        db.add(product)
+        db.flush()
+        db.add_all([
+            WarrantyPricingBand(insurance_product_id=product.id, msrp_min=0, msrp_max=1000,
+                                price_2_year=80, price_3_year=120),
+            WarrantyPricingBand(insurance_product_id=product.id, msrp_min=100, msrp_max=200,
+                                price_2_year=20, price_3_year=30),
+        ])
+        db.commit()
+    band_index.refresh()
+
+    _, found = band_index.lookup('TVs', 500)
+    assert found is not None and found.price_2_year == 80
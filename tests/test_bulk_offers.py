@@ -0,0 +1,137 @@
+import pytest
+from sqlalchemy import text
+
+from app.routes.offers import parse_bulk_offer_operations
+
+from .conftest import auth_headers
+
+GOOD_OFFER = {'headline': 'Protect it', 'body': 'Two years of cover', 'button_text': 'Add'}
+
+
+def test_bad_field_values_fail_their_own_operation():
+    operations, results, failure = parse_bulk_offer_operations({'operations': [
+        {'action': 'create', 'offer': GOOD_OFFER},
+        {'action': 'create', 'offer': {**GOOD_OFFER, 'layout_id': 'abc'}},
+        {'action': 'create', 'offer': {**GOOD_OFFER, 'headline': ['not', 'text']}},
+        {'action': 'update', 'id': 1, 'offer': {'body': 42}},
+        {'action': 'update', 'id': 2, 'offer': {'theme': 'blue'}},
+        {'action': 'update', 'id': 3, 'offer': {'button_text': 'x' * 256}},
+        {'action': 'update', 'id': 4, 'offer': {'layout_id': True}},
+        {'action': 'update', 'id': 5, 'offer': {'image_url': 'a\x00b'}},
+        {'action': 'delete', 'id': 2 ** 31},
+        {'action': 'update', 'id': 6, 'offer': {'layout_id': None, 'button_url': None}},
+    ]})
+
+    assert failure is None
+    assert [operation.index for operation in operations] == [0, 9]
+    errors = {result['index']: result['error'] for result in results if result}
+    assert errors == {
+        1: 'layout_id must be a positive integer',
+        2: 'headline must be a string',
+        3: 'body must be a string',
+        4: 'theme must be an object',
+        5: 'button_text must be at most 255 characters',
+        6: 'layout_id must be a positive integer',
+        7: 'image_url must not contain NUL characters',
+        8: 'Missing or invalid id',
+    }
+
+
+@pytest.mark.parametrize('body, error', [
+    (None, 'Missing operations'),
+    ([{'action': 'delete', 'id': 1}], 'Missing operations'),
+    ({'operations': []}, 'Missing operations'),
+    ({'operations': {'action': 'delete'}}, 'Missing operations'),
+    ({'operations': [{'action': 'delete', 'id': 1}] * 501}, 'Too many operations (max 500)'),
+])
+def test_invalid_requests_fail_as_a_whole(body, error, monkeypatch):
+    monkeypatch.setattr('app.config.Config.OFFERS_BULK_MAX_OPERATIONS', 500)
+    assert parse_bulk_offer_operations(body) == (None, None, (error, 400))
+
+
+def test_invalid_operations_fail_on_their_own():
+    operations, results, failure = parse_bulk_offer_operations({'operations': [
+        'not an object',
+        {'action': 'rename', 'id': 1},
+        {'action': 'create', 'offer': {'headline': 'No body'}},
+        {'action': 'update', 'id': 1, 'offer': {'unknown': 'field'}},
+        {'action': 'set_status', 'id': 2, 'status': 'archived'},
+        {'action': 'toggle_status', 'id': '3'},
+        {'action': 'delete', 'id': 4},
+        {'action': 'toggle_status', 'id': 4},
+        {'action': 'update', 'id': 5, 'offer': {'theme': {'id': 12}}},
+    ]})
+
+    assert failure is None
+    assert [(operation.index, operation.offer_id) for operation in operations] == [(6, 4), (8, 5)]
+    assert operations[1].fields == {'theme': {'id': 12}, 'theme_id': 12}
+    assert [result and result['error'] for result in results] == [
+        'Invalid action',
+        'Invalid action',
+        'Missing required field: body',
+        'No fields to update',
+        'status must be one of: active, inactive, draft',
+        'Missing or invalid id',
+        None,
+        'Offer appears in more than one operation',
+        None,
+    ]
+    assert results[1] == {'index': 1, 'action': 'rename', 'id': 1, 'success': False, 'error': 'Invalid action'}
+
+
+def test_bulk_on_sqlite(client):
+    headers = auth_headers()
+    first, second = (client.post('/api/offers', headers=headers, json=GOOD_OFFER).get_json()['offer_id']
+                     for _ in range(2))
+
+    response = client.post('/api/offers/bulk', headers=headers, json={'operations': [
+        {'action': 'create', 'offer': GOOD_OFFER},
+        {'action': 'create', 'offer': {**GOOD_OFFER, 'layout_id': 999}},
+        {'action': 'delete', 'id': first},
+        {'action': 'toggle_status', 'id': second},
+        {'action': 'set_status', 'id': 999, 'status': 'draft'},
+        {'action': 'create', 'offer': {**GOOD_OFFER, 'headline': 7}},
+    ]})
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['success'] for result in results] == [True, False, True, True, False, False]
+    assert [result.get('error') for result in results[1::3]] == ['Layout not found', 'Offer not found']
+    assert results[3]['status'] == 'inactive'
+    assert response.get_json()['summary'] == {'succeeded': 3, 'failed': 3}
+
+    assert client.post('/api/offers/bulk', headers=headers, json=[]).status_code == 400
+
+
+def test_bulk_mixes_bad_items_with_good_ones(pg_client, pg_engine):
+    headers = auth_headers()
+    layout_id = pg_client.post('/api/layouts', headers=headers, json={'name': 'Card'}).get_json()['layout']['id']
+    with pg_engine.begin() as conn:
+        other_shop = conn.execute(text(
+            "INSERT INTO shops (shop_url, api_key) VALUES ('other.myshopify.com', 'other') RETURNING id"
+        )).scalar()
+        other_layout = conn.execute(text(
+            "INSERT INTO offer_layouts (shop_id, name) VALUES (:shop_id, 'Theirs') RETURNING id"
+        ), {'shop_id': other_shop}).scalar()
+    offer_id = pg_client.post('/api/offers', headers=headers, json=GOOD_OFFER).get_json()['offer_id']
+
+    response = pg_client.post('/api/offers/bulk', headers=headers, json={'operations': [
+        {'action': 'create', 'offer': {**GOOD_OFFER, 'layout_id': layout_id}},
+        {'action': 'create', 'offer': {**GOOD_OFFER, 'layout_id': other_layout}},
+        {'action': 'create', 'offer': {**GOOD_OFFER, 'layout_id': 'abc'}},
+        {'action': 'create', 'offer': {**GOOD_OFFER, 'headline': 7}},
+        {'action': 'update', 'id': offer_id, 'offer': {'headline': 'Updated', 'layout_id': layout_id}},
+        {'action': 'update', 'id': 999999, 'offer': {'layout_id': 999999}},
+    ]})
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['success'] for result in results] == [True, False, False, False, True, False]
+    assert results[1]['error'] == 'Layout not found'
+    assert results[5]['error'] == 'Layout not found'
+    assert response.get_json()['summary'] == {'succeeded': 2, 'failed': 4}
+
+    offers = pg_client.get('/api/offers', headers=headers, query_string={'fields': 'headline,layout_id'}).get_json()
+    assert sorted((offer['headline'], offer['layout_id']) for offer in offers['offers']) == [
+        ('Protect it', layout_id), ('Updated', layout_id)
+    ]
@@ -0,0 +1,11 @@
+def test_cache_counters_are_not_public(client):
+    assert client.get('/health').status_code == 200
+    assert client.get('/health/caches').status_code == 404
+
+
+def test_cache_counters_need_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr('app.config.Config.ADMIN_API_TOKEN', 'admin-token')
+    assert client.get('/api/admin/metrics').status_code == 401
+
+    caches = client.get('/api/admin/metrics', headers={'Authorization': 'Bearer admin-token'}).get_json()['caches']
+    assert set(caches) == {'shop_auth', 'offer_bundle', 'layout_renders'}
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.services.layout_templates import LayoutRenderer
+from app.services.offer_bundle_cache import offer_bundle_cache
+
+from .conftest import auth_headers
+
+OFFER = {'headline': 'Protect it', 'body': 'Two years of cover', 'button_text': 'Add'}
+
+
+def bundle(client):
+    response = client.get('/api/offer-bundle', headers=auth_headers())
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_offer_writes_invalidate_the_bundle(client):
+    assert bundle(client)['offer'] is None
+
+    offer_id = client.post('/api/offers', headers=auth_headers(), json=OFFER).get_json()['offer_id']
+    assert bundle(client)['offer']['headline'] == 'Protect it'
+    # Served from the snapshot until the next write
+    hits = offer_bundle_cache.hits
+    bundle(client)
+    assert offer_bundle_cache.hits == hits + 1
+
+    client.put(f'/api/offers/{offer_id}', headers=auth_headers(), json={'headline': 'Updated'})
+    assert bundle(client)['offer']['headline'] == 'Updated'
+
+    client.post(f'/api/offers/{offer_id}/toggle-status', headers=auth_headers())
+    assert bundle(client)['offer'] is None
+
+
+def test_layout_edit_changes_the_render_key():
+    renderer = LayoutRenderer()
+    offer = {'id': 1, 'updated_at': datetime(2025, 1, 1), **OFFER}
+    layout = {'id': 7, 'updated_at': datetime(2025, 1, 1), 'preview_html': '<h2>{{headline}}</h2>'}
+    assert renderer.render_offer(layout, offer) == '<h2>Protect it</h2>'
+    assert renderer.render_offer(dict(layout), offer) == '<h2>Protect it</h2>'
+    assert renderer.hits == 1
+
+    edited = {**layout, 'updated_at': datetime(2025, 1, 2), 'preview_html': '<p>{{body}}</p>'}
+    assert renderer.render_offer(edited, offer) == '<p>Two years of cover</p>'
+    edited_offer = {**offer, 'updated_at': datetime(2025, 1, 2), 'body': 'Three years'}
+    assert renderer.render_offer(edited, edited_offer) == '<p>Three years</p>'
+
+
+# The layout and settings routes format Postgres timestamps, so they run on TEST_DATABASE_URL
+
+def test_settings_write_invalidates_the_bundle(pg_client, pg_engine):
+    with pg_engine.begin() as conn:
+        conn.execute(text('INSERT INTO shop_settings (shop_id, show_offer_on_checkout, show_email_optin) '
+                          'SELECT id, true, true FROM shops'))
+    assert bundle(pg_client)['settings']['show_email_optin'] is True
+
+    response = pg_client.put('/api/shops/settings', headers=auth_headers(), json={'show_email_optin': False})
+    assert response.status_code == 200
+    assert bundle(pg_client)['settings']['show_email_optin'] is False
+
+
+def test_layout_edit_rerenders_the_offer(pg_client):
+    headers = auth_headers()
+    layout = pg_client.post('/api/layouts', headers=headers,
+                            json={'name': 'Card', 'preview_html': '<h2>{{headline}}</h2>'}).get_json()['layout']
+    pg_client.post('/api/offers', headers=headers, json={**OFFER, 'layout_id': layout['id']})
+    assert bundle(pg_client)['rendered_html'] == '<h2>Protect it</h2>'
+
+    response = pg_client.put(f"/api/layouts/{layout['id']}", headers=headers,
+                             json={'preview_html': '<p>{{headline}}: {{body}}</p>'})
+    assert response.status_code == 200
+    assert bundle(pg_client)['rendered_html'] == '<p>Protect it: Two years of cover</p>'
@@ -0,0 +1,64 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.database import Offer, Shop, get_db
+from app.routes.offers import decode_offers_cursor, encode_offers_cursor
+
+from .conftest import auth_headers
+
+START = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def offers(client):
+    """Seven offers; the last three share one created_at, so only id orders them"""
+    with get_db() as db:
+        shop_id = db.query(Shop.id).scalar()
+        created = [START + timedelta(minutes=minute) for minute in (0, 1, 2, 3, 4, 4, 4)]
+        db.add_all([Offer(shop_id=shop_id, headline=f'offer {n}', created_at=created_at)
+                    for n, created_at in enumerate(created)])
+        db.commit()
+    return client
+
+
+def headlines(response):
+    return [offer['headline'] for offer in response.get_json()['offers']]
+
+
+def test_cursor_round_trip():
+    cursor = encode_offers_cursor(START, 42)
+    assert decode_offers_cursor(cursor) == (START, 42)
+    assert decode_offers_cursor('not a cursor') is None
+    assert decode_offers_cursor(base64.urlsafe_b64encode(b'2025-01-01T12:00:00').decode()) is None
+    assert decode_offers_cursor(base64.urlsafe_b64encode(b'yesterday|42').decode()) is None
+
+
+def test_without_limit_or_cursor_every_offer_is_returned(offers, monkeypatch):
+    monkeypatch.setattr('app.config.Config.OFFERS_PAGE_SIZE', 2)
+    body = offers.get('/api/offers', headers=auth_headers()).get_json()
+    assert len(body['offers']) == 7
+    assert body['next_cursor'] is None
+
+
+def test_pages_cover_every_offer_once(offers):
+    seen = []
+    cursor = None
+    while True:
+        query = {'limit': 2, 'fields': 'headline'}
+        if cursor:
+            query['cursor'] = cursor
+        body = offers.get('/api/offers', headers=auth_headers(), query_string=query).get_json()
+        seen.extend(offer['headline'] for offer in body['offers'])
+        assert set(body['offers'][0]) == {'id', 'created_at', 'headline'}
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == ['offer 6', 'offer 5', 'offer 4', 'offer 3', 'offer 2', 'offer 1', 'offer 0']
+
+
+def test_invalid_cursor_and_fields(offers):
+    assert offers.get('/api/offers', headers=auth_headers(), query_string={'cursor': 'x'}).status_code == 400
+    assert offers.get('/api/offers', headers=auth_headers(), query_string={'fields': 'nope'}).status_code == 400
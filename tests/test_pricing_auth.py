@@ -0,0 +1,32 @@
+from sqlalchemy import text
+
+from app.services.shop_auth_cache import shop_auth_cache
+
+from .conftest import QUOTE_PARAMS, auth_headers
+
+
+def test_regenerated_key_stops_cached_quotes_at_once(priced_client):
+    assert priced_client.get('/api/pricing', headers=auth_headers(), query_string=QUOTE_PARAMS).status_code == 200
+
+    new_key = priced_client.post('/api/shops/api-key', headers=auth_headers()).get_json()['api_key']
+
+    assert priced_client.get('/api/pricing', headers=auth_headers(), query_string=QUOTE_PARAMS).status_code == 401
+    assert priced_client.get('/api/pricing', headers=auth_headers(new_key),
+                             query_string=QUOTE_PARAMS).status_code == 200
+
+
+def test_cached_quote_needs_a_valid_key(priced_client):
+    assert priced_client.get('/api/pricing', headers=auth_headers(), query_string=QUOTE_PARAMS).status_code == 200
+    assert priced_client.get('/api/pricing', headers=auth_headers('wrong-key'),
+                             query_string=QUOTE_PARAMS).status_code == 401
+
+
+def test_cached_quote_is_not_served_once_the_key_is_gone(priced_client, engine):
+    assert priced_client.get('/api/pricing', headers=auth_headers(), query_string=QUOTE_PARAMS).status_code == 200
+
+    # Rotated on another worker, and this worker's shop entry expired or was evicted
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE shops SET api_key = 'rotated-key'"))
+    shop_auth_cache.clear()
+
+    assert priced_client.get('/api/pricing', headers=auth_headers(), query_string=QUOTE_PARAMS).status_code == 401
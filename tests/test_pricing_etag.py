@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from app.routes.offers import PricingRequest, pricing_response_etag
+from app.services.quote_cache import QuoteCache
+
+
+def pricing_request(session_token='session_a', as_of=None):
+    return PricingRequest(session_token, 'product-1', 120, 'TVs', as_of, 'single')
+
+
+def test_responses_with_different_bodies_get_different_etags():
+    cache = QuoteCache(ttl=60, max_entries=10)
+    key = cache.key(1, 'shop.myshopify.com', 'key', 'TVs', 7)
+    quote = cache.put(key, 'variant-1', {'product_category': 'TVs'})
+
+    etags = {
+        pricing_response_etag(pricing_request('session_a'), quote),
+        pricing_response_etag(pricing_request('session_b'), quote),
+        pricing_response_etag(pricing_request('session_a', datetime(2025, 1, 1)), quote),
+        pricing_response_etag(pricing_request('session_a', datetime(2025, 6, 1)), quote),
+    }
+    assert len(etags) == 4
+    assert quote.etag not in etags
+
+    # The same request revalidates against the same ETag
+    assert (pricing_response_etag(pricing_request('session_a'), quote) ==
+            pricing_response_etag(pricing_request('session_a'), cache.get(key)))
@@ -0,0 +1,18 @@
+import pytest
+
+from app.routes.offers import parse_batch_pricing_request, parse_pricing_request
+
+from .conftest import auth_headers
+
+
+@pytest.mark.parametrize('body', [[1, 2], 'text', 3, True])
+def test_non_object_bodies_are_rejected(body):
+    assert parse_pricing_request(body) == (None, ('Request body must be a JSON object', 400))
+    assert parse_batch_pricing_request(body) == (None, ('Request body must be a JSON object', 400))
+
+
+@pytest.mark.parametrize('path', ['/api/pricing', '/api/pricing/batch'])
+def test_array_body_is_a_bad_request(priced_client, path):
+    response = priced_client.post(path, headers=auth_headers(), json=[{'session_token': 'session_a'}])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Request body must be a JSON object'
@@ -0,0 +1,37 @@
+from sqlalchemy import event
+
+from app.routes import offers
+
+from .conftest import auth_headers
+
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return {'data': {'product': {'variants': {'edges': []}}}}
+
+
+def test_connection_is_released_before_shopify_calls(client, engine, monkeypatch):
+    checked_out = []
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(*args):
+        checked_out.append(1)
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(*args):
+        checked_out.pop()
+
+    held_during_call = []
+
+    def post(*args, **kwargs):
+        held_during_call.append(len(checked_out))
+        return FakeResponse()
+
+    monkeypatch.setattr(offers.requests, 'post', post)
+
+    response = client.post('/api/cleanup-variants', headers=auth_headers())
+    assert response.status_code == 200
+    assert response.get_json()['message'] == 'No cleanup needed'
+    assert held_during_call == [0]
@@ -0,0 +1,53 @@
+from sqlalchemy import text
+
+from app.services.shop_auth_cache import shop_auth_cache
+
+from .conftest import SHOP_URL, auth_headers
+
+
+def rotate_key(engine, api_key):
+    """Change the key behind the cache, as regenerate_api_key on another worker does"""
+    with engine.begin() as conn:
+        conn.execute(text('UPDATE shops SET api_key = :api_key WHERE shop_url = :shop_url'),
+                     {'api_key': api_key, 'shop_url': SHOP_URL})
+
+
+def test_cached_key_is_served_without_a_query(client):
+    assert client.get('/api/shops/me', headers=auth_headers()).status_code == 200
+    hits = shop_auth_cache.hits
+    assert client.get('/api/shops/me', headers=auth_headers()).status_code == 200
+    assert shop_auth_cache.hits == hits + 1
+
+
+def test_key_rotated_behind_the_cache(client, engine):
+    assert client.get('/api/shops/me', headers=auth_headers()).status_code == 200
+
+    rotate_key(engine, 'rotated-key')
+
+    # The new key is re-checked against the database and replaces the cached one
+    assert client.get('/api/shops/me', headers=auth_headers('rotated-key')).status_code == 200
+    assert client.get('/api/shops/me', headers=auth_headers()).status_code == 401
+    assert client.get('/api/shops/me', headers=auth_headers('rotated-key')).status_code == 200
+
+
+def test_wrong_key_rechecks_are_rate_limited(client, monkeypatch):
+    assert client.get('/api/shops/me', headers=auth_headers()).status_code == 200
+    monkeypatch.setattr(shop_auth_cache, 'recheck_interval', 60)
+
+    rechecks = shop_auth_cache.rechecks
+    for _ in range(5):
+        assert client.get('/api/shops/me', headers=auth_headers('wrong-key')).status_code == 401
+    assert shop_auth_cache.rechecks == rechecks + 1
+
+    # The right key is still served from the cache
+    assert client.get('/api/shops/me', headers=auth_headers()).status_code == 200
+
+
+def test_removed_shop_is_dropped_from_the_cache(client, engine):
+    assert client.get('/api/shops/me', headers=auth_headers()).status_code == 200
+
+    with engine.begin() as conn:
+        conn.execute(text('DELETE FROM shops WHERE shop_url = :shop_url'), {'shop_url': SHOP_URL})
+
+    assert client.get('/api/shops/me', headers=auth_headers('any-key')).status_code == 404
+    assert shop_auth_cache.get(SHOP_URL) is None
@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.models.database import offer_theme_id
+
+MIGRATION = Path(__file__).resolve().parent.parent / 'add_theme_id_to_offers.sql'
+
+THEME_IDS = [5, '5', '05', 0, '0', -3, '-3', 2 ** 31 - 1, str(2 ** 31 - 1), 2 ** 31, str(2 ** 31),
+             '00000000000012', 99999999999, 1.5, '1.5', 'abc', '٣', True, None, [1], {'id': 1}]
+
+
+def test_offer_theme_id_range():
+    assert [offer_theme_id({'id': value}) for value in (5, '5', 0, '0', 2 ** 31 - 1, 2 ** 31, True, '٣')] == [
+        5, 5, None, None, 2 ** 31 - 1, None, None, None
+    ]
+    assert offer_theme_id(None) is None
+    assert offer_theme_id({'name': 'no id'}) is None
+
+
+def backfill_statement():
+    """The UPDATE of the migration, without its comments"""
+    sql = '\n'.join(line for line in MIGRATION.read_text().splitlines() if not line.lstrip().startswith('--'))
+    return next(statement for statement in sql.split(';') if statement.strip().startswith('UPDATE'))
+
+
+def test_backfill_matches_offer_theme_id(pg_engine):
+    themes = [{'id': value, 'name': 'x'} for value in THEME_IDS] + [{'name': 'no id'}]
+    with pg_engine.begin() as conn:
+        shop_id = conn.execute(text('SELECT id FROM shops')).scalar()
+        for theme in themes:
+            conn.execute(text('INSERT INTO offers (shop_id, theme, theme_id, created_at) VALUES (:shop_id, :theme, 0, now())'),
+                         {'shop_id': shop_id, 'theme': json.dumps(theme)})
+        conn.execute(text(backfill_statement()))
+        rows = conn.execute(text('SELECT theme, theme_id FROM offers ORDER BY id')).all()
+
+    assert [theme_id for _, theme_id in rows] == [offer_theme_id(theme) for theme in themes]